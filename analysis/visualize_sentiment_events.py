@@ -5,16 +5,30 @@ This script creates plots showing the sentiment data with local minima and maxim
 highlighted to verify the event identification logic.
 """
 
+import numpy as np
 import pandas as pd
+import matplotlib
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import argparse
 import os
 
 # Global constants
 INPUT_PATH = "data/derived/news_sentiment_with_events.csv"
+EVENT_DTYPES = {
+    'News.Sentiment': 'float32',
+    'local_min': 'int8',
+    'local_max': 'int8',
+    'yr': 'int16',
+}
 OUTPUT_DIR = "output/figures"
+SAVE_DPI = 150
+PNG_COMPRESS_LEVEL = 1
+RASTERIZE_MIN_POINTS = 1000
+X_NUM_COL = '_xnum'
+EVENT_WINDOW = np.timedelta64(30, 'D')
 
 
 def load_event_data(path):
@@ -25,10 +39,14 @@ def load_event_data(path):
         path: Path to CSV with sentiment and event indicators
         
     Returns:
-        DataFrame with parsed dates
+        DataFrame with parsed dates, sorted by date, plus the dates as
+        Matplotlib float day numbers in X_NUM_COL (used as plot x values)
     """
-    df = pd.read_csv(path)
-    df['date'] = pd.to_datetime(df['date'])
+    df = pd.read_csv(path, dtype=EVENT_DTYPES, parse_dates=['date'])
+    df = df.sort_values('date', kind='stable').reset_index(drop=True)
+    
+    # Convert dates to plot coordinates once rather than on every draw
+    df[X_NUM_COL] = mdates.date2num(df['date'].to_numpy())
     
     print(f"Loaded {len(df)} observations")
     print(f"Events: {(df['local_min'] == 1).sum()} minima, {(df['local_max'] == 1).sum()} maxima")
@@ -36,30 +54,70 @@ def load_event_data(path):
     return df
 
 
+def m4_downsample_indices(y, n_buckets):
+    """
+    Select row positions that preserve the shape of a long line plot (M4).
+    
+    The series is split into n_buckets equal-width buckets and the first, last,
+    minimum and maximum point of each bucket are kept. At one bucket per pixel
+    column the rendered line is visually identical to plotting every point.
+    
+    Args:
+        y: 1-D array of values to plot
+        n_buckets: Number of buckets (typically the plot width in pixels)
+        
+    Returns:
+        Sorted array of integer positions into y
+    """
+    n = len(y)
+    if n <= 4 * n_buckets:
+        return np.arange(n)
+    
+    # Pad to a whole number of equal buckets; padding never wins min/max
+    bucket_size = -(-n // n_buckets)
+    padded = np.full(bucket_size * n_buckets, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(n_buckets, bucket_size)
+    offsets = np.arange(n_buckets) * bucket_size
+    
+    idx_min = offsets + np.where(np.isnan(buckets), np.inf, buckets).argmin(axis=1)
+    idx_max = offsets + np.where(np.isnan(buckets), -np.inf, buckets).argmax(axis=1)
+    idx_first = offsets
+    idx_last = np.minimum(offsets + bucket_size - 1, n - 1)
+    
+    idx = np.unique(np.concatenate([idx_first, idx_min, idx_max, idx_last]))
+    return idx[idx < n]
+
+
 def plot_full_time_series(df):
     """
     Create overview plot of entire time series with events.
     
     Args:
-        df: DataFrame with sentiment and event indicators
+        df: DataFrame with sentiment and event indicators (from load_event_data)
     """
     fig, ax = plt.subplots(figsize=(16, 6))
     
-    # Plot sentiment line
-    ax.plot(df['date'], df['News.Sentiment'], 
-            color='steelblue', linewidth=0.8, alpha=0.7, label='News Sentiment')
+    # Plot sentiment line, downsampled to the saved figure's pixel width
+    n_buckets = int(fig.get_figwidth() * SAVE_DPI)
+    line_data = df.iloc[m4_downsample_indices(df['News.Sentiment'].to_numpy(), n_buckets)]
+    ax.plot(line_data[X_NUM_COL], line_data['News.Sentiment'], 
+            color='steelblue', linewidth=0.8, alpha=0.7, label='News Sentiment',
+            rasterized=True)
     
     # Highlight minima
     minima = df[df['local_min'] == 1]
-    ax.scatter(minima['date'], minima['News.Sentiment'], 
+    ax.scatter(minima[X_NUM_COL], minima['News.Sentiment'], 
                color='red', s=50, marker='v', alpha=0.8, 
-               label=f'Local Minima (n={len(minima)})', zorder=5)
+               label=f'Local Minima (n={len(minima)})', zorder=5,
+               rasterized=len(minima) > RASTERIZE_MIN_POINTS)
     
     # Highlight maxima
     maxima = df[df['local_max'] == 1]
-    ax.scatter(maxima['date'], maxima['News.Sentiment'], 
+    ax.scatter(maxima[X_NUM_COL], maxima['News.Sentiment'], 
                color='green', s=50, marker='^', alpha=0.8, 
-               label=f'Local Maxima (n={len(maxima)})', zorder=5)
+               label=f'Local Maxima (n={len(maxima)})', zorder=5,
+               rasterized=len(maxima) > RASTERIZE_MIN_POINTS)
     
     # Formatting
     ax.set_xlabel('Date', fontsize=12, fontweight='bold')
@@ -70,6 +128,7 @@ def plot_full_time_series(df):
     ax.grid(True, alpha=0.3, linestyle='--')
     
     # Format x-axis
+    ax.xaxis_date()
     ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y'))
     ax.xaxis.set_major_locator(mdates.YearLocator())
     plt.setp(ax.xaxis.get_majorticklabels(), rotation=45, ha='right')
@@ -83,7 +142,7 @@ def plot_yearly_panels(df, years_to_plot=None):
     Create multi-panel plot showing detailed view by year.
     
     Args:
-        df: DataFrame with sentiment and event indicators
+        df: DataFrame with sentiment and event indicators (from load_event_data)
         years_to_plot: List of years to plot (default: first 6 years)
     """
     if years_to_plot is None:
@@ -96,25 +155,31 @@ def plot_yearly_panels(df, years_to_plot=None):
     fig, axes = plt.subplots(n_rows, n_cols, figsize=(16, 4 * n_rows))
     axes = axes.flatten()
     
+    # Split by year once instead of masking the full frame for every panel
+    empty = df.iloc[:0]
+    data_by_year = dict(iter(df.groupby('yr', sort=False)))
+    minima_by_year = dict(iter(df[df['local_min'] == 1].groupby('yr', sort=False)))
+    maxima_by_year = dict(iter(df[df['local_max'] == 1].groupby('yr', sort=False)))
+    
     for idx, year in enumerate(years_to_plot):
         ax = axes[idx]
-        year_data = df[df['yr'] == year].copy()
+        year_data = data_by_year.get(year, empty)
         
         # Plot sentiment line
-        ax.plot(year_data['date'], year_data['News.Sentiment'], 
-                color='steelblue', linewidth=1.2, alpha=0.7)
+        ax.plot(year_data[X_NUM_COL], year_data['News.Sentiment'], 
+                color='steelblue', linewidth=1.2, alpha=0.7, rasterized=True)
         
         # Highlight minima
-        minima = year_data[year_data['local_min'] == 1]
+        minima = minima_by_year.get(year, empty)
         if len(minima) > 0:
-            ax.scatter(minima['date'], minima['News.Sentiment'], 
+            ax.scatter(minima[X_NUM_COL], minima['News.Sentiment'], 
                       color='red', s=80, marker='v', alpha=0.9, 
                       label=f'Minima ({len(minima)})', zorder=5)
         
         # Highlight maxima
-        maxima = year_data[year_data['local_max'] == 1]
+        maxima = maxima_by_year.get(year, empty)
         if len(maxima) > 0:
-            ax.scatter(maxima['date'], maxima['News.Sentiment'], 
+            ax.scatter(maxima[X_NUM_COL], maxima['News.Sentiment'], 
                       color='green', s=80, marker='^', alpha=0.9, 
                       label=f'Maxima ({len(maxima)})', zorder=5)
         
@@ -126,6 +191,7 @@ def plot_yearly_panels(df, years_to_plot=None):
         ax.grid(True, alpha=0.3, linestyle='--')
         
         # Format x-axis
+        ax.xaxis_date()
         ax.xaxis.set_major_formatter(mdates.DateFormatter('%b'))
         ax.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
         plt.setp(ax.xaxis.get_majorticklabels(), rotation=45, ha='right')
@@ -145,7 +211,7 @@ def plot_event_details(df, n_examples=6):
     Create detailed zoom-in plots of individual events.
     
     Args:
-        df: DataFrame with sentiment and event indicators
+        df: DataFrame with sentiment and event indicators (from load_event_data)
         n_examples: Number of example events to show (3 min + 3 max)
     """
     # Get top extremity events
@@ -160,40 +226,48 @@ def plot_event_details(df, n_examples=6):
     fig, axes = plt.subplots(n_rows, n_cols, figsize=(16, 4 * n_rows))
     axes = axes.flatten()
     
-    for idx, (event_idx, event_row) in enumerate(events.iterrows()):
+    # Each event window is a binary search on sorted dates instead of a full scan
+    if not df['date'].is_monotonic_increasing:
+        df = df.sort_values('date', kind='stable').reset_index(drop=True)
+    date_arr = df['date'].to_numpy()
+    
+    event_cols = ['date', X_NUM_COL, 'local_min', 'extremity_score', 'News.Sentiment']
+    event_rows = events[event_cols].itertuples(index=False, name=None)
+    
+    for idx, (event_date, event_x, local_min, extremity, sentiment) in enumerate(event_rows):
         ax = axes[idx]
-        event_date = event_row['date']
-        event_type = 'Minimum' if event_row['local_min'] == 1 else 'Maximum'
-        extremity = event_row['extremity_score']
+        event_type = 'Minimum' if local_min == 1 else 'Maximum'
         
         # Get window around event (±30 days)
-        window_start = event_date - pd.Timedelta(days=30)
-        window_end = event_date + pd.Timedelta(days=30)
-        window_data = df[(df['date'] >= window_start) & (df['date'] <= window_end)]
+        event_dt64 = event_date.asm8
+        lo = np.searchsorted(date_arr, event_dt64 - EVENT_WINDOW, side='left')
+        hi = np.searchsorted(date_arr, event_dt64 + EVENT_WINDOW, side='right')
+        window_data = df.iloc[lo:hi]
         
         # Plot sentiment line
-        ax.plot(window_data['date'], window_data['News.Sentiment'], 
-                color='steelblue', linewidth=1.5, alpha=0.7)
+        ax.plot(window_data[X_NUM_COL], window_data['News.Sentiment'], 
+                color='steelblue', linewidth=1.5, alpha=0.7, rasterized=True)
         
         # Highlight the event
         color = 'red' if event_type == 'Minimum' else 'green'
         marker = 'v' if event_type == 'Minimum' else '^'
-        ax.scatter([event_date], [event_row['News.Sentiment']], 
+        ax.scatter([event_x], [sentiment], 
                   color=color, s=150, marker=marker, alpha=0.9, 
                   edgecolors='black', linewidths=2, zorder=5)
         
         # Add vertical line at event
-        ax.axvline(event_date, color=color, linestyle='--', alpha=0.5, linewidth=2)
+        ax.axvline(event_x, color=color, linestyle='--', alpha=0.5, linewidth=2)
         
         # Formatting
         ax.set_xlabel('Date', fontsize=10)
         ax.set_ylabel('Sentiment', fontsize=10)
         title = f'{event_type}: {event_date.strftime("%Y-%m-%d")}\n'
-        title += f'Sentiment: {event_row["News.Sentiment"]:.3f}, Extremity: {extremity:.3f}'
+        title += f'Sentiment: {sentiment:.3f}, Extremity: {extremity:.3f}'
         ax.set_title(title, fontsize=10, fontweight='bold')
         ax.grid(True, alpha=0.3, linestyle='--')
         
         # Format x-axis
+        ax.xaxis_date()
         ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
         plt.setp(ax.xaxis.get_majorticklabels(), rotation=45, ha='right')
     
@@ -211,6 +285,8 @@ def save_figure(fig, filename, output_dir=OUTPUT_DIR):
     """
     Save figure to output directory.
     
+    Uses fast (level 1) PNG compression; saving is dominated by zlib otherwise.
+    
     Args:
         fig: Matplotlib figure object
         filename: Output filename
@@ -219,7 +295,8 @@ def save_figure(fig, filename, output_dir=OUTPUT_DIR):
     import os
     os.makedirs(output_dir, exist_ok=True)
     output_path = os.path.join(output_dir, filename)
-    fig.savefig(output_path, dpi=300, bbox_inches='tight')
+    fig.savefig(output_path, dpi=SAVE_DPI, bbox_inches='tight',
+                pil_kwargs={'compress_level': PNG_COMPRESS_LEVEL})
     print(f"Saved: {output_path}")
 
 
@@ -256,6 +333,12 @@ def parse_arguments():
         help='Suffix to add to output filenames (e.g., "_5day")'
     )
     
+    parser.add_argument(
+        '--show',
+        action='store_true',
+        help='Display the figures interactively after saving'
+    )
+    
     return parser.parse_args()
 
 
@@ -273,33 +356,51 @@ def main():
     print(f"Output directory: {args.output_dir}")
     print("=" * 60)
     
+    # Render off-screen unless the figures will be shown
+    if not args.show:
+        matplotlib.use('Agg')
+    
     # Load data
     df = load_event_data(args.input)
     
     # Create full time series plot
     print("\nCreating full time series plot...")
     fig1 = plot_full_time_series(df)
-    save_figure(fig1, "sentiment_events_full_series.png")
     
     # Create yearly panel plots
     print("\nCreating yearly panel plots...")
     fig2 = plot_yearly_panels(df, years_to_plot=[2012, 2013, 2014, 2015, 2016, 2017])
-    save_figure(fig2, "sentiment_events_yearly_2012_2017.png")
-    
     fig3 = plot_yearly_panels(df, years_to_plot=[2018, 2019, 2020, 2021, 2022, 2023])
-    save_figure(fig3, "sentiment_events_yearly_2018_2023.png")
     
     # Create detailed event plots
     print("\nCreating detailed event plots...")
     fig4 = plot_event_details(df, n_examples=6)
-    save_figure(fig4, "sentiment_events_detail.png")
+    
+    # Save all figures in parallel (each save is CPU-bound rendering/encoding)
+    print("\nSaving figures...")
+    figures = [
+        (fig1, "sentiment_events_full_series.png"),
+        (fig2, "sentiment_events_yearly_2012_2017.png"),
+        (fig3, "sentiment_events_yearly_2018_2023.png"),
+        (fig4, "sentiment_events_detail.png"),
+    ]
+    with ProcessPoolExecutor(
+        max_workers=len(figures), initializer=matplotlib.use, initargs=('Agg',)
+    ) as executor:
+        list(executor.map(
+            save_figure,
+            [fig for fig, _ in figures],
+            [filename for _, filename in figures],
+            [args.output_dir] * len(figures)
+        ))
     
     print("\n" + "=" * 60)
-    print("Done! Check output/figures/ for visualizations")
+    print(f"Done! Check {args.output_dir}/ for visualizations")
     print("=" * 60)
     
     # Show plots
-    plt.show()
+    if args.show:
+        plt.show()
 
 
 if __name__ == "__main__":
@@ -8,13 +8,101 @@ Author: Generated for congressional trading analysis
 Date: 2025-11-09
 """
 
-import pandas as pd
-from datetime import datetime
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+from csv_utils import write_table_csv
 
 # Paths
 CHECKPOINT_PATH = "/Users/caleb/Research/congress_trading/data/derived/yahoo_fetch_checkpoint.csv"
 FILTERED_STOCK_PATH = "/Users/caleb/Research/congress_trading/data/derived/all_stock_data_filtered.csv"
 OUTPUT_STOCK_PATH = "/Users/caleb/Research/congress_trading/data/derived/all_stock_data_filtered_enhanced.csv"
+OUTPUT_STOCK_PARQUET_PATH = os.path.splitext(OUTPUT_STOCK_PATH)[0] + ".parquet"
+
+# Columns
+KEY_COLUMNS = ["Date", "Ticker"]
+EXPECTED_COLUMNS = ["Date", "Ticker", "Open", "High", "Low", "Close",
+                    "Volume", "Dividends", "Stock Splits"]
+NULL_KEY = -1
+# Trailing UTC offset ("+00:00", "-05:00", "Z") on older checkpoint dates
+UTC_OFFSET_PATTERN = r"(Z|[+-]\d{2}:\d{2})$"
+
+
+def read_stock_csv(path, date_type):
+    """
+    Read a stock CSV into an Arrow table with a typed Date column.
+    
+    Args:
+        path: Path to CSV file
+        date_type: Arrow type used to parse the Date column
+        
+    Returns:
+        pyarrow.Table
+    """
+    convert_options = pv.ConvertOptions(column_types={"Date": date_type})
+    return pv.read_csv(path, convert_options=convert_options)
+
+
+def read_checkpoint(path):
+    """
+    Read the Yahoo fetch checkpoint into an Arrow table with naive dates.
+    
+    fetch_missing_tickers writes exchange-local, tz-naive dates. Checkpoints
+    from older runs carry a UTC offset instead; the offset is stripped so both
+    parse to the same wall-clock timestamp as the existing stock data.
+    
+    Args:
+        path: Path to checkpoint CSV
+        
+    Returns:
+        pyarrow.Table with Date as timestamp[ns]
+    """
+    table = read_stock_csv(path, pa.string())
+    local_dates = pc.replace_substring_regex(
+        table.column("Date"), UTC_OFFSET_PATTERN, ""
+    )
+    date_idx = table.schema.get_field_index("Date")
+    return table.set_column(date_idx, "Date", local_dates.cast(pa.timestamp("ns")))
+
+
+def drop_duplicate_keys(table):
+    """
+    Drop repeated (Date, Ticker) rows, keeping the first occurrence.
+    
+    The table must be stably sorted by (Date, Ticker), so duplicates sit next
+    to each other and are found by comparing each row with the one before it.
+    
+    Args:
+        table: pyarrow.Table sorted by the key columns
+        
+    Returns:
+        pyarrow.Table with one row per (Date, Ticker), still sorted
+    """
+    if table.num_rows == 0:
+        return table
+    
+    # Integer keys: epoch values for dates, dictionary codes for tickers
+    dates = pc.fill_null(table.column("Date").cast(pa.int64()), NULL_KEY).to_numpy()
+    ticker_codes = pc.dictionary_encode(table.column("Ticker").combine_chunks()).indices
+    tickers = pc.fill_null(ticker_codes, NULL_KEY).to_numpy()
+    
+    # A row is a duplicate if both keys equal the previous row's
+    is_dup = np.empty(table.num_rows, dtype=bool)
+    is_dup[0] = False
+    is_dup[1:] = (dates[1:] == dates[:-1]) & (tickers[1:] == tickers[:-1])
+    
+    return table.filter(pa.array(~is_dup))
+
+
+def date_range_str(table):
+    """Format the min/max of a table's Date column for printing."""
+    bounds = pc.min_max(table.column("Date"))
+    return f"{bounds['min'].as_py()} to {bounds['max'].as_py()}"
 
 
 def main():
@@ -25,69 +113,68 @@ def main():
     
     # Load checkpoint data
     print(f"\nLoading checkpoint data from {CHECKPOINT_PATH}...")
-    df_new = pd.read_csv(CHECKPOINT_PATH)
-    print(f"  Loaded {len(df_new):,} rows across {df_new['Ticker'].nunique()} unique tickers")
-    
-    # Parse dates and ensure timezone-naive
-    print("  Parsing dates and removing timezone info...")
-    df_new["Date"] = pd.to_datetime(df_new["Date"], utc=True).dt.tz_localize(None)
-    print(f"  Date range: {df_new['Date'].min()} to {df_new['Date'].max()}")
+    new_table = read_checkpoint(CHECKPOINT_PATH)
+    n_new_tickers = pc.count_distinct(new_table.column("Ticker")).as_py()
+    print(f"  Loaded {new_table.num_rows:,} rows across {n_new_tickers} unique tickers")
+    print(f"  Date range: {date_range_str(new_table)}")
     
     # Load existing stock data
     print(f"\nLoading existing stock data from {FILTERED_STOCK_PATH}...")
-    df_existing = pd.read_csv(FILTERED_STOCK_PATH)
-    print(f"  Loaded {len(df_existing):,} rows")
+    existing_table = read_stock_csv(FILTERED_STOCK_PATH, pa.timestamp("ns"))
+    print(f"  Loaded {existing_table.num_rows:,} rows")
+    print(f"  Date range: {date_range_str(existing_table)}")
     
-    # Parse existing dates
-    df_existing["Date"] = pd.to_datetime(df_existing["Date"])
-    print(f"  Date range: {df_existing['Date'].min()} to {df_existing['Date'].max()}")
-    
-    # Combine
+    # Combine (columns are matched by name)
     print("\nCombining datasets...")
-    df_combined = pd.concat([df_existing, df_new], ignore_index=True)
-    print(f"  Combined: {len(df_combined):,} rows")
+    combined = pa.concat_tables(
+        [existing_table, new_table], promote_options="permissive"
+    ).combine_chunks()
+    print(f"  Combined: {combined.num_rows:,} rows")
+    
+    # Sort (stable, so existing rows stay ahead of checkpoint rows on ties)
+    print("\nSorting by Date and Ticker...")
+    combined = combined.sort_by([(col, "ascending") for col in KEY_COLUMNS])
     
     # Remove duplicates
     print("\nRemoving duplicates (Date, Ticker)...")
-    original_len = len(df_combined)
-    df_combined = df_combined.drop_duplicates(subset=["Date", "Ticker"], keep="first")
-    duplicates_removed = original_len - len(df_combined)
+    original_len = combined.num_rows
+    combined = drop_duplicate_keys(combined)
+    duplicates_removed = original_len - combined.num_rows
     print(f"  Removed {duplicates_removed:,} duplicate rows")
-    print(f"  Remaining: {len(df_combined):,} rows")
-    
-    # Sort
-    print("\nSorting by Date and Ticker...")
-    df_combined = df_combined.sort_values(["Date", "Ticker"]).reset_index(drop=True)
+    print(f"  Remaining: {combined.num_rows:,} rows")
     
     # Verify columns match expected format
-    expected_columns = ["Date", "Ticker", "Open", "High", "Low", "Close", 
-                       "Volume", "Dividends", "Stock Splits"]
-    if list(df_combined.columns) != expected_columns:
+    if combined.column_names != EXPECTED_COLUMNS:
         print(f"\nWarning: Column order doesn't match expected format")
-        print(f"  Expected: {expected_columns}")
-        print(f"  Got: {list(df_combined.columns)}")
+        print(f"  Expected: {EXPECTED_COLUMNS}")
+        print(f"  Got: {combined.column_names}")
         print("  Reordering columns...")
-        df_combined = df_combined[expected_columns]
+        combined = combined.select(EXPECTED_COLUMNS)
     
-    # Save
+    # Save (dates formatted the same way filter_data_step1 writes this file)
     print(f"\nSaving enhanced stock data to {OUTPUT_STOCK_PATH}...")
-    df_combined.to_csv(OUTPUT_STOCK_PATH, index=False)
+    write_table_csv(combined, OUTPUT_STOCK_PATH)
+    
+    # Parquet copy for readers that don't need the CSV
+    print(f"Saving Parquet copy to {OUTPUT_STOCK_PARQUET_PATH}...")
+    pq.write_table(combined, OUTPUT_STOCK_PARQUET_PATH, compression="zstd")
     
     # Summary statistics
     print("\n" + "="*70)
     print("APPEND COMPLETE")
     print("="*70)
     print(f"\nFinal dataset statistics:")
-    print(f"  Total rows: {len(df_combined):,}")
-    print(f"  Unique tickers: {df_combined['Ticker'].nunique():,}")
-    print(f"  Date range: {df_combined['Date'].min()} to {df_combined['Date'].max()}")
-    print(f"\nOriginal data: {len(df_existing):,} rows")
-    print(f"New data added: {len(df_new):,} rows")
+    print(f"  Total rows: {combined.num_rows:,}")
+    print(f"  Unique tickers: {pc.count_distinct(combined.column('Ticker')).as_py():,}")
+    print(f"  Date range: {date_range_str(combined)}")
+    print(f"\nOriginal data: {existing_table.num_rows:,} rows")
+    print(f"New data added: {new_table.num_rows:,} rows")
     print(f"Duplicates removed: {duplicates_removed:,} rows")
-    print(f"Net addition: {len(df_combined) - len(df_existing):,} rows")
+    print(f"Net addition: {combined.num_rows - existing_table.num_rows:,} rows")
     
     print(f"\nEnhanced stock data saved to:")
     print(f"  {OUTPUT_STOCK_PATH}")
+    print(f"  {OUTPUT_STOCK_PARQUET_PATH}")
     
     print("\n✓ Ready to re-filter congressional trading data with enhanced stock data!")
 
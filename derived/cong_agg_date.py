@@ -25,19 +25,21 @@ Example Usage:
     
     # CLI usage
     python derived/cong_agg_date.py --date 2025-08-26 --window 30 --output output.csv
+    python derived/cong_agg_date.py --date 2025-08-26 --output output.parquet
 
 Author: Generated for congressional trading analysis
 Date: 2025-11-12
 """
 
-import re
 import warnings
+from functools import lru_cache
 from pathlib import Path
 from typing import Union, Optional, Tuple
 import argparse
 
 import numpy as np
 import pandas as pd
+from scipy.sparse import coo_matrix
 
 
 # Global constants
@@ -49,7 +51,12 @@ TRADE_SIZE_COL = "Trade_Size_USD"
 TRANSACTION_COL = "Transaction"
 OUTPUT_TOTAL_COL = "Total_Trade_Size_USD"
 OUTPUT_DATE_COL = "Date"
+TRADE_SIZE_MID_COL = "Trade_Size_USD_Mid"
+CACHE_SUFFIX = ".agg_cache.parquet"
+LOADED_DATA_CACHE_SIZE = 4
+OUTPUT_FORMATS = ("csv", "parquet")
 PERCENT_SCALE = 100.0
+TRADE_SIZE_PATTERN = r"([0-9][0-9,]*\.?[0-9]*)(?:[^0-9]+([0-9][0-9,]*\.?[0-9]*))?"
 
 
 def parse_date_input(date_input: Union[str, pd.Timestamp, pd.DatetimeIndex]) -> pd.Timestamp:
@@ -87,12 +94,44 @@ def parse_date_input(date_input: Union[str, pd.Timestamp, pd.DatetimeIndex]) ->
         raise ValueError(f"Error parsing date input '{date_input}': {str(e)}")
 
 
-def load_congress_trades(data_path: Path = DATA_PATH) -> Tuple[pd.DataFrame, str]:
+def cached_date_column(df: pd.DataFrame) -> Optional[str]:
     """
-    Load and standardize congressional trading data.
+    Return the date column of a cached frame, or None if the cache is unusable.
+    
+    A usable cache has every column load_congress_trades writes, with the
+    dtypes it writes them with (parsed dates, categorical tickers, float
+    midpoints).
+    """
+    date_col = next((c for c in DATE_COLUMN_CANDIDATES if c in df.columns), None)
+    if date_col is None or not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        return None
+    if not {TICKER_COL, TRADE_SIZE_COL, TRANSACTION_COL, TRADE_SIZE_MID_COL} <= set(df.columns):
+        return None
+    if not (
+        isinstance(df[TICKER_COL].dtype, pd.CategoricalDtype)
+        and pd.api.types.is_string_dtype(df[TRADE_SIZE_COL])
+        and pd.api.types.is_float_dtype(df[TRADE_SIZE_MID_COL])
+    ):
+        return None
+    return date_col
+
+
+def load_congress_trades(
+    data_path: Path = DATA_PATH,
+    use_cache: bool = True
+) -> Tuple[pd.DataFrame, str]:
+    """
+    Load and standardize congressional trading data, sorted by trade date.
+    
+    With use_cache, trade size midpoints are parsed for every row and the
+    result is cached next to the CSV as a ".agg_cache.parquet" file, reused for
+    as long as it is newer than the CSV and has the expected columns. Without
+    the cache the midpoint column is not added; callers parse only the rows
+    they need (see get_aggregated_window).
     
     Args:
         data_path: Path to congressional trading CSV file
+        use_cache: Whether to read/write the Parquet cache (default True)
     
     Returns:
         Tuple of (DataFrame, date_column_name)
@@ -104,21 +143,56 @@ def load_congress_trades(data_path: Path = DATA_PATH) -> Tuple[pd.DataFrame, str
     if not data_path.exists():
         raise FileNotFoundError(f"Data file not found: {data_path}")
     
-    df = pd.read_csv(data_path, low_memory=False)
+    cache_path = data_path.with_suffix(CACHE_SUFFIX)
+    
+    if (
+        use_cache
+        and cache_path.exists()
+        and cache_path.stat().st_mtime >= data_path.stat().st_mtime
+    ):
+        df = pd.read_parquet(cache_path, engine="pyarrow")
+        date_col = cached_date_column(df)
+        if date_col is not None:
+            if not df[date_col].is_monotonic_increasing:
+                df = df.sort_values(date_col, kind="stable").reset_index(drop=True)
+            return df, date_col
+        warnings.warn(f"Ignoring Parquet cache {cache_path} with unexpected columns")
+    
+    # Read the header only, so the full read can be limited to the columns used
+    available_cols = pd.read_csv(data_path, nrows=0).columns
     
     # Identify date column
     date_col = None
     for candidate in DATE_COLUMN_CANDIDATES:
-        if candidate in df.columns:
+        if candidate in available_cols:
             date_col = candidate
             break
     
     if date_col is None:
         raise KeyError(
             f"No date column found. Expected one of: {DATE_COLUMN_CANDIDATES}. "
-            f"Found columns: {list(df.columns)}"
+            f"Found columns: {list(available_cols)}"
         )
     
+    # Check for required columns
+    if TICKER_COL not in available_cols:
+        raise KeyError(f"Required column '{TICKER_COL}' not found in data")
+    
+    if TRADE_SIZE_COL not in available_cols:
+        raise KeyError(f"Required column '{TRADE_SIZE_COL}' not found in data")
+    
+    usecols = [date_col, TICKER_COL, TRADE_SIZE_COL]
+    if TRANSACTION_COL in available_cols:
+        usecols.append(TRANSACTION_COL)
+    
+    # Multithreaded Arrow parser; tickers are dictionary-encoded as categories
+    df = pd.read_csv(
+        data_path,
+        engine="pyarrow",
+        usecols=usecols,
+        dtype={TICKER_COL: "category", TRADE_SIZE_COL: "string[pyarrow]"}
+    )
+    
     # Parse and clean date column
     df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
     initial_rows = len(df)
@@ -128,13 +202,6 @@ def load_congress_trades(data_path: Path = DATA_PATH) -> Tuple[pd.DataFrame, str
     if dropped_dates > 0:
         warnings.warn(f"Dropped {dropped_dates} rows with invalid dates")
     
-    # Check for required columns
-    if TICKER_COL not in df.columns:
-        raise KeyError(f"Required column '{TICKER_COL}' not found in data")
-    
-    if TRADE_SIZE_COL not in df.columns:
-        raise KeyError(f"Required column '{TRADE_SIZE_COL}' not found in data")
-    
     # Handle missing tickers
     initial_rows = len(df)
     df = df.dropna(subset=[TICKER_COL])
@@ -147,9 +214,36 @@ def load_congress_trades(data_path: Path = DATA_PATH) -> Tuple[pd.DataFrame, str
     if TRANSACTION_COL not in df.columns:
         df[TRANSACTION_COL] = "Unknown"
     
+    # Sort by date once so date windows can be located with a binary search
+    df = df.sort_values(date_col, kind="stable").reset_index(drop=True)
+    
+    if use_cache:
+        # Store parsed midpoints so cached loads never re-parse
+        df[TRADE_SIZE_MID_COL] = parse_trade_size_to_mid(df[TRADE_SIZE_COL])
+        try:
+            df.to_parquet(cache_path, engine="pyarrow", compression="zstd")
+        except OSError as e:
+            warnings.warn(f"Could not write Parquet cache {cache_path}: {e}")
+    
     return df, date_col
 
 
+@lru_cache(maxsize=LOADED_DATA_CACHE_SIZE)
+def _load_congress_trades_cached(
+    data_path: Path,
+    mtime_ns: Optional[int],
+    use_cache: bool
+) -> Tuple[pd.DataFrame, str]:
+    """
+    Memoized load_congress_trades, keyed on the file's modification time.
+    
+    Repeated windows (e.g. one per event in create_panel.py) share a single
+    loaded DataFrame, so callers must not modify it in place. A changed file
+    has a new mtime_ns and is loaded again.
+    """
+    return load_congress_trades(data_path, use_cache)
+
+
 def parse_trade_size_to_mid(series: pd.Series) -> pd.Series:
     """
     Parse Trade_Size_USD column to midpoint numeric values.
@@ -171,28 +265,15 @@ def parse_trade_size_to_mid(series: pd.Series) -> pd.Series:
         1    50000.0
         dtype: float64
     """
-    def extract_midpoint(value):
-        if pd.isna(value):
-            return np.nan
-        
-        # Convert to string and extract all numbers
-        value_str = str(value)
-        numbers = re.findall(r"[0-9][0-9,]*\.?[0-9]*", value_str)
-        
-        if len(numbers) == 0:
-            return np.nan
-        
-        # Remove commas and convert to float
-        clean_numbers = [float(n.replace(",", "")) for n in numbers]
-        
-        if len(clean_numbers) >= 2:
-            # Take first two as low and high, compute midpoint
-            return (clean_numbers[0] + clean_numbers[1]) / 2.0
-        
-        # Single number - use as-is
-        return clean_numbers[0]
+    # Pull the first number and, if present, the second number that follows it
+    numbers = series.astype("string").str.extract(TRADE_SIZE_PATTERN)
+    
+    # Remove commas and convert to float
+    low = numbers[0].str.replace(",", "", regex=False).astype("float64")
+    high = numbers[1].str.replace(",", "", regex=False).astype("float64")
     
-    return series.apply(extract_midpoint)
+    # Midpoint of low and high; single numbers are used as-is
+    return (low + high.fillna(low)) / 2.0
 
 
 def filter_date_window(
@@ -204,28 +285,35 @@ def filter_date_window(
     """
     Filter DataFrame to ±window_days around anchor date.
     
+    The window is located by binary search, so df must be sorted by date_col
+    (as returned by load_congress_trades).
+    
     Args:
-        df: DataFrame with date column
+        df: DataFrame sorted by date column
         date_col: Name of date column
         anchor_date: Center date for window
         window_days: Number of days before and after anchor date
     
     Returns:
-        Tuple of (filtered DataFrame, complete date range index)
+        Tuple of (filtered DataFrame, complete date range index). The
+        filtered DataFrame is a positional slice of df and is not copied.
     """
-    start_date = anchor_date - pd.Timedelta(days=window_days)
-    end_date = anchor_date + pd.Timedelta(days=window_days)
-    
-    # Filter to window
-    df_window = df[
-        (df[date_col] >= start_date) & 
-        (df[date_col] <= end_date)
-    ].copy()
+    # Window bounds as NumPy datetimes (no Timestamp/Timedelta objects needed)
+    anchor = anchor_date.to_datetime64()
+    delta = np.timedelta64(window_days, "D")
+    start_date = anchor - delta
+    end_date = anchor + delta
+    
+    # Locate the window bounds in the sorted dates and slice
+    dates = df[date_col].to_numpy()
+    lo = np.searchsorted(dates, start_date, side="left")
+    hi = np.searchsorted(dates, end_date, side="right")
+    df_window = df.iloc[lo:hi]
     
     # Create complete date range for full window
     full_index = pd.date_range(
-        start_date.normalize(), 
-        end_date.normalize(), 
+        start_date.astype("datetime64[D]"), 
+        end_date.astype("datetime64[D]"), 
         freq="D"
     )
     
@@ -242,6 +330,8 @@ def aggregate_by_date_ticker(
     Aggregate trades by date and ticker, computing percentage weights.
     
     Both Purchases and Sales are treated as positive contributions to volume.
+    Sizes are summed into a sparse date x ticker matrix (most tickers trade on
+    only a few days of the window) and densified only for the output.
     
     Args:
         df_window: Filtered DataFrame with trades in window
@@ -256,29 +346,38 @@ def aggregate_by_date_ticker(
         # Return empty DataFrame with correct structure
         return pd.DataFrame(columns=[OUTPUT_DATE_COL, OUTPUT_TOTAL_COL])
     
-    # Normalize dates to midnight
-    df_window[date_col] = df_window[date_col].dt.normalize()
+    # Truncate dates to calendar days (kept local; df_window is not modified)
+    days = df_window[date_col].to_numpy().astype("datetime64[D]")
     
-    # Group by date and ticker, sum trade sizes
-    grouped = df_window.groupby([date_col, ticker_col])[size_mid_col].sum().reset_index()
+    # Integer codes for the dates and tickers that occur in the window
+    date_codes, dates = pd.factorize(days, sort=True)
+    ticker_codes, tickers = pd.factorize(df_window[ticker_col], sort=True)
     
-    # Pivot to wide format: dates as rows, tickers as columns
-    pivot = grouped.pivot(
-        index=date_col, 
-        columns=ticker_col, 
-        values=size_mid_col
-    ).fillna(0.0)
+    # Sum trade sizes into a sparse table: dates as rows, tickers as columns
+    # (duplicate date/ticker entries are summed by the CSR conversion)
+    sizes = coo_matrix(
+        (df_window[size_mid_col].to_numpy(dtype=np.float64), (date_codes, ticker_codes)),
+        shape=(len(dates), len(tickers))
+    ).tocsr()
     
     # Compute daily totals across all tickers
-    totals = pivot.sum(axis=1)
-    
-    # Compute percentage weights (0-100 scale)
-    # Replace zero totals with NaN to avoid division by zero, then fill NaN weights with 0
-    weights = pivot.div(totals.replace(0, np.nan), axis=0) * PERCENT_SCALE
-    weights = weights.fillna(0.0)
+    totals = np.asarray(sizes.sum(axis=1)).ravel()
+    
+    # Compute percentage weights (0-100 scale), leaving zero-total days at 0
+    weights = sizes.copy()
+    entry_totals = np.repeat(totals, np.diff(sizes.indptr))
+    has_volume = entry_totals > 0
+    weights.data = np.zeros_like(sizes.data)
+    weights.data[has_volume] = (
+        sizes.data[has_volume] / entry_totals[has_volume] * PERCENT_SCALE
+    )
     
     # Combine into output DataFrame
-    result = weights.copy()
+    result = pd.DataFrame(
+        weights.toarray(),
+        index=pd.Index(dates, name=date_col),
+        columns=tickers
+    )
     result.insert(0, OUTPUT_TOTAL_COL, totals)
     
     # Reset index to make date a column
@@ -329,16 +428,18 @@ def reindex_full_window(
 def get_aggregated_window(
     date_input: Union[str, pd.Timestamp],
     window_days: int = DEFAULT_DATE_WINDOW_DAYS,
-    data_path: Path = DATA_PATH
+    data_path: Path = DATA_PATH,
+    use_cache: bool = True
 ) -> pd.DataFrame:
     """
     Get aggregated congressional trading data for a date window.
     
     Main function that orchestrates the full data processing pipeline:
     1. Parses input date
-    2. Loads congressional trading data
-    3. Parses trade size midpoints
-    4. Filters to date window
+    2. Loads congressional trading data (from the Parquet cache when fresh;
+       reused across calls until the CSV changes)
+    3. Filters to date window
+    4. Parses trade size midpoints for the window (unless cached)
     5. Aggregates by date and ticker
     6. Computes ticker percentage weights
     7. Ensures all dates in window are present
@@ -347,6 +448,7 @@ def get_aggregated_window(
         date_input: Center date for window (string or Timestamp)
         window_days: Number of days before and after date (default 30)
         data_path: Path to congressional trading CSV (default DATA_PATH)
+        use_cache: Whether to use the Parquet cache of the parsed CSV (default True)
     
     Returns:
         Wide-format DataFrame with:
@@ -363,31 +465,35 @@ def get_aggregated_window(
     # Parse input date
     anchor_date = parse_date_input(date_input)
     
-    # Load data
-    df, date_col = load_congress_trades(data_path)
+    # Load data (once per file version; later calls reuse the loaded frame)
+    mtime_ns = data_path.stat().st_mtime_ns if data_path.exists() else None
+    df, date_col = _load_congress_trades_cached(data_path, mtime_ns, use_cache)
     
-    # Parse trade sizes to midpoints
-    df["Trade_Size_USD_Mid"] = parse_trade_size_to_mid(df[TRADE_SIZE_COL])
+    # Filter to date window
+    df_window, full_index = filter_date_window(df, date_col, anchor_date, window_days)
+    
+    # Parse trade sizes to midpoints, only for the rows in the window
+    if TRADE_SIZE_MID_COL not in df_window.columns:
+        df_window = df_window.assign(
+            **{TRADE_SIZE_MID_COL: parse_trade_size_to_mid(df_window[TRADE_SIZE_COL])}
+        )
     
     # Drop rows with unparseable trade sizes
-    initial_rows = len(df)
-    df = df.dropna(subset=["Trade_Size_USD_Mid"])
-    dropped_sizes = initial_rows - len(df)
+    initial_rows = len(df_window)
+    df_window = df_window.dropna(subset=[TRADE_SIZE_MID_COL])
+    dropped_sizes = initial_rows - len(df_window)
     
     if dropped_sizes > 0:
         warnings.warn(
             f"Dropped {dropped_sizes} rows with unparseable trade sizes"
         )
     
-    # Filter to date window
-    df_window, full_index = filter_date_window(df, date_col, anchor_date, window_days)
-    
     # Aggregate by date and ticker
     result = aggregate_by_date_ticker(
         df_window, 
         date_col, 
         TICKER_COL, 
-        "Trade_Size_USD_Mid"
+        TRADE_SIZE_MID_COL
     )
     
     # Reindex to ensure all dates in window are present
@@ -401,7 +507,9 @@ def main(
     window_days: int = DEFAULT_DATE_WINDOW_DAYS,
     data_path: Path = DATA_PATH,
     output_path: Optional[Union[str, Path]] = None,
-    return_df: bool = True
+    return_df: bool = True,
+    use_cache: bool = True,
+    output_format: Optional[str] = None
 ) -> Optional[pd.DataFrame]:
     """
     Main execution function for congressional trading aggregation.
@@ -410,20 +518,37 @@ def main(
         date_input: Center date for window
         window_days: Number of days before and after date (default 30)
         data_path: Path to congressional trading CSV (default DATA_PATH)
-        output_path: Optional path to save CSV output
+        output_path: Optional path to save output
         return_df: Whether to return DataFrame (default True)
+        use_cache: Whether to use the Parquet cache of the parsed CSV (default True)
+        output_format: "csv" or "parquet"; inferred from the output_path
+                       suffix when None (".parquet" -> parquet, otherwise csv)
     
     Returns:
         DataFrame if return_df=True, otherwise None
+    
+    Raises:
+        ValueError: If output_format is not one of OUTPUT_FORMATS
     """
     # Get aggregated window
-    df = get_aggregated_window(date_input, window_days, data_path)
+    df = get_aggregated_window(date_input, window_days, data_path, use_cache)
     
-    # Save to CSV if output path provided
+    # Save output if output path provided
     if output_path is not None:
         output_path = Path(output_path)
+        if output_format is None:
+            output_format = "parquet" if output_path.suffix == ".parquet" else "csv"
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(
+                f"Unknown output format '{output_format}'. "
+                f"Expected one of: {OUTPUT_FORMATS}"
+            )
+        
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        df.to_csv(output_path, index=False)
+        if output_format == "parquet":
+            df.to_parquet(output_path, engine="pyarrow", compression="zstd", index=False)
+        else:
+            df.to_csv(output_path, index=False)
     
     # Return DataFrame if requested
     if return_df:
@@ -461,7 +586,20 @@ if __name__ == "__main__":
         "--output",
         type=str,
         default=None,
-        help="Optional path to save CSV output"
+        help="Optional path to save output"
+    )
+    
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default=None,
+        help="Output file format (default: inferred from --output suffix, csv otherwise)"
+    )
+    
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-parse the CSV instead of using (or writing) the Parquet cache"
     )
     
     args = parser.parse_args()
@@ -481,7 +619,9 @@ if __name__ == "__main__":
         window_days=args.window,
         data_path=Path(args.data_path),
         output_path=args.output,
-        return_df=True
+        return_df=True,
+        use_cache=not args.no_cache,
+        output_format=args.format
     )
     
     print(f"\nResult:")
@@ -10,41 +10,52 @@ import json
 
 INPUT = 'data/derived/news_sentiment_with_events_20dayEX.csv'
 OUTPUT = 'data/derived/panel.csv'
+OUTPUT_PARQUET = 'data/derived/panel.parquet'
 WINDOW_DAYS = 30
+PRINT_EVERY = 10
 
 sent = pd.read_csv(INPUT)
 
 mins = sent.loc[sent['local_min'] == 1, 'date'].tolist()
 maxs = sent.loc[sent['local_max']==1, 'date'].tolist()
 
-min_df = pd.DataFrame()
+min_frames = []
 min_maps = {}
 for i,m in enumerate(mins):
     df = get_aggregated_window(m,window_days = WINDOW_DAYS)
     mar = get_market_volumes(m,window_days = WINDOW_DAYS)
     df['treat'] = f'event_{i}'
     min_maps[i] = m
-    df = pd.merge(df[['Date','Total_Trade_Size_USD','treat']],mar,on='Date')
-    min_df = pd.concat([min_df, df], ignore_index=True)
-    print(f'{i},{m}')
+    df = pd.merge(df[['Date','Total_Trade_Size_USD','treat']],mar,on='Date',how='inner',validate='1:1')
+    min_frames.append(df)
+    del df, mar
+    if i % PRINT_EVERY == 0:
+        print(f'{i},{m}')
 
-max_df = pd.DataFrame()
+# collect per-event frames and concat once (concat in the loop copies every time)
+min_df = pd.concat(min_frames, ignore_index=True, copy=False) if min_frames else pd.DataFrame()
+
+max_frames = []
 max_maps = {}
 for i,m in enumerate(maxs):
     df = get_aggregated_window(m,window_days = WINDOW_DAYS)
     mar = get_market_volumes(m,window_days = WINDOW_DAYS)
     df['treat'] = f'event_{i+len(mins)}'
     max_maps[i+len(mins)] = m
-    df = pd.merge(df[['Date','Total_Trade_Size_USD','treat']],mar,on='Date')
-    max_df = pd.concat([max_df,df],ignore_index = True)
-    print(f'{i+len(mins)},{m}')
+    df = pd.merge(df[['Date','Total_Trade_Size_USD','treat']],mar,on='Date',how='inner',validate='1:1')
+    max_frames.append(df)
+    del df, mar
+    if i % PRINT_EVERY == 0:
+        print(f'{i+len(mins)},{m}')
 
+max_df = pd.concat(max_frames, ignore_index=True, copy=False) if max_frames else pd.DataFrame()
 
 max_df['event'] = 'max'
 min_df['event'] = 'min'
 
-final_df = pd.concat([max_df,min_df],ignore_index = True)
-final_df.to_csv(OUTPUT)
+final_df = pd.concat([max_df,min_df],ignore_index = True, copy=False)
+final_df.to_csv(OUTPUT)  # regression.R reads the csv
+final_df.to_parquet(OUTPUT_PARQUET, compression='zstd', index=False)
 
 with open('data/derived/max_maps.json', 'w') as f:
     json.dump(max_maps, f)
@@ -0,0 +1,38 @@
+"""
+Shared Arrow CSV Helpers
+
+Purpose:
+    Write Arrow tables to CSV in the same layout DataFrame.to_csv produces,
+    for the scripts that filter the congressional and stock data.
+"""
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+
+
+def format_dates_like_pandas(dates):
+    """
+    Format a timestamp array as strings the way DataFrame.to_csv does.
+    
+    Dates are written as YYYY-MM-DD when every value is at midnight,
+    otherwise as YYYY-MM-DD HH:MM:SS.
+    """
+    at_midnight = pc.all(pc.equal(pc.floor_temporal(dates, unit="day"), dates)).as_py()
+    fmt = "%Y-%m-%d" if at_midnight in (True, None) else "%Y-%m-%d %H:%M:%S"
+    return pc.strftime(dates, format=fmt)
+
+
+def write_table_csv(table, path):
+    """
+    Write an Arrow table to CSV.
+    
+    Timestamp columns are formatted as DataFrame.to_csv would, and string
+    values are quoted so free-text fields may contain commas.
+    """
+    for idx, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type):
+            table = table.set_column(
+                idx, field.name, format_dates_like_pandas(table.column(idx))
+            )
+    pv.write_csv(table, path)
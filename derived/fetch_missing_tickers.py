@@ -12,70 +12,89 @@ Date: 2025-11-09
 """
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import yfinance as yf
 from datetime import datetime
+import shutil
 import time
 import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import compress
 from pathlib import Path
+from urllib.parse import quote
+
+from complete_yahoo_append import read_checkpoint
 
 # Global constants
 RAW_CONGRESS_PATH = "/Users/caleb/Research/congress_trading/data/raw/congress_trading.csv"
 FILTERED_STOCK_PATH = "/Users/caleb/Research/congress_trading/data/derived/all_stock_data_filtered.csv"
 OUTPUT_STOCK_PATH = "/Users/caleb/Research/congress_trading/data/derived/all_stock_data_filtered_enhanced.csv"
+OUTPUT_STOCK_PARQUET_PATH = str(Path(OUTPUT_STOCK_PATH).with_suffix(".parquet"))
 REPORT_PATH = "/Users/caleb/Research/congress_trading/data/derived/yahoo_fetch_report.md"
+CHECKPOINT_PATH = "/Users/caleb/Research/congress_trading/data/derived/yahoo_fetch_checkpoint.csv"
+FETCH_CACHE_DIR = "/Users/caleb/Research/congress_trading/data/derived/yahoo_fetch_cache"
+FETCH_CACHE_EXPIRE_SECONDS = 86400
 START_DATE = "2012-01-01"
 END_DATE = "2024-12-31"
 BATCH_SIZE = 50
 SLEEP_BETWEEN_BATCHES = 2
-
-
-def is_valid_ticker(ticker):
-    """
-    Determine if a ticker is potentially valid for Yahoo Finance.
-    
-    Filters out obvious non-tickers like bonds, CUSIPs, dates, etc.
+MAX_WORKERS = 10
+STOCK_COLUMNS = ["Date", "Ticker", "Open", "High", "Low", "Close",
+                 "Volume", "Dividends", "Stock Splits"]
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+ACTION_COLUMNS = ["Dividends", "Stock Splits"]
+# Declared so every CSV block parses to one schema (not inferred from the first block)
+STOCK_COLUMN_TYPES = {
+    "Date": pa.timestamp("ns"),
+    "Ticker": pa.string(),
+    **{col: pa.float64() for col in PRICE_COLUMNS + ACTION_COLUMNS},
+}
+KEY_COLUMNS = ["Date", "Ticker"]
+
+# Ticker validation rules (applied by valid_ticker_mask)
+DATE_KEYWORDS = ("DUE", "MATURE", "WEEK", "MONTH", "/")
+INVALID_KEYWORDS = (
+    "SYMBOL", "TYPE", "DATE", "FUND", "MATURE", "TREASURY",
+    "BITCOIN", "RIPPLE", "SOLANA", "TRON", "DUE", "INTEREST",
+    "PARTNER", "INVEST", "CORPORAT", "STATE OF", "MONTGOMERY"
+)
+FOREIGN_SUFFIXES = (".IL", ".MI", ".TI", ".PA", ".SG", ".V", ".AS",
+                    ".MU", ".F", ".BE", ".SW")
+BOND_PREFIXES = ("912", "9142")
+NUMERIC_TICKER_PATTERN = r"[0-9.\-]*[0-9][0-9.\-]*"
+CUSIP_PATTERN = r"\d{9,}"
+
+
+def valid_ticker_mask(tickers):
     """
-    if pd.isna(ticker) or ticker == "":
-        return False
+    Determine which tickers are potentially valid for Yahoo Finance.
     
-    # Filter out numeric-only tickers
-    if ticker.replace(".", "").replace("-", "").isdigit():
-        return False
+    Filters out obvious non-tickers like bonds, CUSIPs, dates, etc. The whole
+    sequence is checked at once with pandas string methods (Arrow kernels).
     
-    # Filter out dates and maturity terms
-    date_keywords = ["DUE", "MATURE", "WEEK", "MONTH", "/"]
-    if any(keyword in ticker for keyword in date_keywords):
-        return False
-    
-    # Filter out CUSIP-like identifiers (9+ digits)
-    if re.search(r'\d{9,}', ticker):
-        return False
-    
-    # Filter out obvious treasury/bond identifiers
-    if ticker.startswith("912") or ticker.startswith("9142"):
-        return False
-    
-    # Filter out entries that are clearly not tickers
-    invalid_keywords = [
-        "SYMBOL", "TYPE", "DATE", "FUND", "MATURE", "TREASURY",
-        "BITCOIN", "RIPPLE", "SOLANA", "TRON", "DUE", "INTEREST",
-        "PARTNER", "INVEST", "CORPORAT", "STATE OF", "MONTGOMERY"
-    ]
-    if any(keyword in ticker for keyword in invalid_keywords):
-        return False
+    Returns a boolean numpy array, True where the ticker passes all filters.
+    """
+    s = pd.Series(list(tickers), dtype="string[pyarrow]")
+    invalid = s.isna() | (s == "").fillna(False)
+    s = s.fillna("")
     
-    # Filter out tickers with foreign exchange suffixes
-    foreign_suffixes = [".IL", ".MI", ".TI", ".PA", ".SG", ".V", ".AS", 
-                       ".MU", ".F", ".BE", ".SW"]
-    if any(ticker.endswith(suffix) for suffix in foreign_suffixes):
-        return False
+    # Numeric-only, dates/maturities, CUSIPs and treasury/bond identifiers
+    invalid |= s.str.fullmatch(NUMERIC_TICKER_PATTERN)
+    invalid |= s.str.contains("|".join(map(re.escape, DATE_KEYWORDS)), regex=True)
+    invalid |= s.str.contains(CUSIP_PATTERN, regex=True)
+    invalid |= s.str.startswith(BOND_PREFIXES)
     
-    # Filter out percentages and other special characters
-    if "%" in ticker or "^" in ticker:
-        return False
+    # Non-ticker keywords, foreign exchange suffixes and special characters
+    invalid |= s.str.contains("|".join(map(re.escape, INVALID_KEYWORDS)), regex=True)
+    invalid |= s.str.endswith(FOREIGN_SUFFIXES)
+    invalid |= s.str.contains("[%^]", regex=True)
     
-    # Keep ticker if it passes all filters
-    return True
+    return ~invalid.to_numpy(dtype=bool)
 
 
 def clean_ticker_for_yahoo(ticker):
@@ -120,25 +139,17 @@ def fetch_ticker_data(ticker, start_date, end_date):
         # Reset index to make Date a column
         hist = hist.reset_index()
         
-        # Rename and select columns to match our stock data format
-        hist = hist.rename(columns={
-            "Date": "Date",
-            "Open": "Open",
-            "High": "High",
-            "Low": "Low",
-            "Close": "Close",
-            "Volume": "Volume",
-            "Dividends": "Dividends",
-            "Stock Splits": "Stock Splits"
-        })
+        # Keep exchange-local calendar dates (same as the batch download)
+        if hist["Date"].dt.tz is not None:
+            hist["Date"] = hist["Date"].dt.tz_localize(None)
         
         # Add ticker column
         hist["Ticker"] = ticker.upper()
         
-        # Select only columns we need
-        columns = ["Date", "Ticker", "Open", "High", "Low", "Close", 
-                  "Volume", "Dividends", "Stock Splits"]
-        hist = hist[columns]
+        # Select only columns we need (history() already uses our column names;
+        # funds also return e.g. "Capital Gains")
+        if list(hist.columns) != STOCK_COLUMNS:
+            hist = hist[STOCK_COLUMNS]
         
         return hist, None
         
@@ -146,29 +157,45 @@ def fetch_ticker_data(ticker, start_date, end_date):
         return None, str(e)
 
 
+def read_unique_tickers(path):
+    """
+    Read only the Ticker column of a CSV and return its unique values.
+    
+    Tickers are upper-cased and stripped; missing values are dropped.
+    Returns a pyarrow string Array.
+    """
+    convert_options = pv.ConvertOptions(
+        include_columns=["Ticker"],
+        column_types={"Ticker": pa.string()},
+        strings_can_be_null=True
+    )
+    table = pv.read_csv(path, convert_options=convert_options)
+    tickers = pc.utf8_trim_whitespace(pc.utf8_upper(table.column("Ticker")))
+    return pc.unique(tickers.drop_null())
+
+
 def get_missing_tickers():
     """Load congressional trading data and identify missing tickers."""
     print("Loading congressional trading data...")
-    df_congress = pd.read_csv(RAW_CONGRESS_PATH, usecols=["Ticker"])
-    df_congress["Ticker"] = df_congress["Ticker"].astype("string").str.upper().str.strip()
-    congress_tickers = set(df_congress["Ticker"].dropna().unique())
+    congress_tickers = pd.Index(read_unique_tickers(RAW_CONGRESS_PATH).to_pandas())
     
     print("Loading existing stock data...")
-    df_stock = pd.read_csv(FILTERED_STOCK_PATH, usecols=["Ticker"], dtype={"Ticker": "string"})
-    df_stock["Ticker"] = df_stock["Ticker"].astype("string").str.upper().str.strip()
-    stock_tickers = set(df_stock["Ticker"].dropna().unique())
+    stock_tickers = pd.Index(read_unique_tickers(FILTERED_STOCK_PATH).to_pandas())
     
-    missing_tickers = congress_tickers - stock_tickers
+    # Hash-based difference in native code, returned sorted
+    missing_tickers = congress_tickers.difference(stock_tickers, sort=True)
     
     print(f"\nFound {len(missing_tickers)} missing tickers")
     
-    return sorted(missing_tickers)
+    return missing_tickers.tolist()
 
 
 def filter_tickers(tickers):
     """Filter tickers to only those potentially valid for Yahoo Finance."""
-    valid = [t for t in tickers if is_valid_ticker(t)]
-    invalid = [t for t in tickers if not is_valid_ticker(t)]
+    tickers = list(tickers)
+    is_valid = valid_ticker_mask(tickers)
+    valid = list(compress(tickers, is_valid))
+    invalid = list(compress(tickers, ~is_valid))
     
     print(f"\nFiltered tickers:")
     print(f"  Valid for Yahoo Finance: {len(valid)}")
@@ -177,10 +204,113 @@ def filter_tickers(tickers):
     return valid, invalid
 
 
-def fetch_batch(tickers, start_date, end_date):
+def download_tickers(yahoo_tickers, start_date, end_date):
+    """
+    Fetch historical data for many tickers with one yfinance.download call.
+    
+    Uses the same price adjustment and corporate actions as Ticker.history.
+    
+    Returns dict of yahoo_ticker -> DataFrame (same columns as
+    fetch_ticker_data) for the tickers that returned data.
+    """
+    try:
+        data = yf.download(
+            yahoo_tickers,
+            start=start_date,
+            end=end_date,
+            group_by="ticker",
+            auto_adjust=True,
+            actions=True,
+            threads=True,
+            progress=False,
+            multi_level_index=True
+        )
+    except Exception:
+        return {}
+    
+    frames = {}
+    downloaded = set(data.columns.get_level_values(0)) if not data.empty else set()
+    for yahoo_ticker in yahoo_tickers:
+        if yahoo_ticker not in downloaded:
+            continue
+        
+        # Rows where every price field is missing belong to other tickers
+        hist = data[yahoo_ticker].dropna(subset=PRICE_COLUMNS, how="all")
+        if hist.empty:
+            continue
+        
+        hist = hist.rename_axis("Date").reset_index()
+        
+        # Volume is float only because of the NaN padding dropped above
+        if hist["Volume"].notna().all():
+            hist["Volume"] = hist["Volume"].astype("int64")
+        for col in ACTION_COLUMNS:
+            if col not in hist.columns:
+                hist[col] = 0.0
+        hist["Ticker"] = yahoo_ticker.upper()
+        frames[yahoo_ticker] = hist[STOCK_COLUMNS]
+    
+    return frames
+
+
+def fetch_cache_path(yahoo_ticker, start_date, end_date):
+    """Path of the on-disk cache file for one ticker and date range."""
+    name = f"{quote(yahoo_ticker, safe='')}_{start_date}_{end_date}.parquet"
+    return Path(FETCH_CACHE_DIR) / name
+
+
+def read_cached_fetch(yahoo_ticker, start_date, end_date):
+    """
+    Return the cached history for a ticker, or None if missing or expired.
+    
+    Entries older than FETCH_CACHE_EXPIRE_SECONDS are ignored, so re-runs
+    within a day skip Yahoo Finance entirely.
+    """
+    path = fetch_cache_path(yahoo_ticker, start_date, end_date)
+    try:
+        if time.time() - path.stat().st_mtime > FETCH_CACHE_EXPIRE_SECONDS:
+            return None
+        return pd.read_parquet(path)
+    except (OSError, ValueError):
+        return None
+
+
+def write_cached_fetch(yahoo_ticker, df, start_date, end_date):
+    """Store a fetched history in the on-disk cache (best effort)."""
+    path = fetch_cache_path(yahoo_ticker, start_date, end_date)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(path, index=False)
+    except OSError as e:
+        print(f"  Warning: could not cache {yahoo_ticker}: {e}")
+
+
+def fetch_cleaned_ticker(ticker, start_date, end_date):
+    """
+    Clean a ticker for Yahoo Finance and fetch its history.
+    
+    Returns (yahoo_ticker, DataFrame or None, error message or None).
+    """
+    yahoo_ticker = clean_ticker_for_yahoo(ticker)
+    df, error = fetch_ticker_data(yahoo_ticker, start_date, end_date)
+    return yahoo_ticker, df, error
+
+
+def fetch_batch(tickers, start_date, end_date, checkpoint_path=None):
     """
     Fetch data for multiple tickers in batches.
     
+    Tickers fetched within the last FETCH_CACHE_EXPIRE_SECONDS are read from
+    the on-disk cache in FETCH_CACHE_DIR instead of Yahoo Finance. The rest
+    of each batch is requested with a single yfinance.download call. Tickers
+    it returns nothing for are retried one by one with Ticker.history, using
+    MAX_WORKERS threads (each request mostly waits on the network), which
+    also provides the error message for the report. Batches are separated
+    by SLEEP_BETWEEN_BATCHES to avoid rate limiting.
+    
+    If checkpoint_path is given, each fetched DataFrame is appended to that
+    CSV as soon as it arrives (the file is created on the first success).
+    
     Returns dict with results and statistics.
     """
     results = {
@@ -190,44 +320,137 @@ def fetch_batch(tickers, start_date, end_date):
     }
     
     total = len(tickers)
-    
-    for i, ticker in enumerate(tickers, 1):
-        print(f"  [{i}/{total}] Fetching {ticker}...", end=" ")
-        
-        # Clean ticker for Yahoo Finance
-        yahoo_ticker = clean_ticker_for_yahoo(ticker)
-        
-        # Fetch data
-        df, error = fetch_ticker_data(yahoo_ticker, start_date, end_date)
-        
-        if df is not None and len(df) > 0:
-            print(f"✓ ({len(df)} rows)")
-            results["successful"].append({
-                "original_ticker": ticker,
-                "yahoo_ticker": yahoo_ticker,
-                "rows": len(df),
-                "date_min": df["Date"].min(),
-                "date_max": df["Date"].max()
-            })
-            results["data_frames"].append(df)
-        else:
-            print(f"✗ ({error})")
-            results["failed"].append({
-                "ticker": ticker,
-                "yahoo_ticker": yahoo_ticker,
-                "error": error
-            })
-        
-        # Sleep between requests to avoid rate limiting
-        if i % BATCH_SIZE == 0 and i < total:
-            print(f"\n  Sleeping {SLEEP_BETWEEN_BATCHES}s to avoid rate limiting...")
-            time.sleep(SLEEP_BETWEEN_BATCHES)
+    i = 0
+    
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor, ExitStack() as stack:
+        checkpoint = None
+        for batch_start in range(0, total, BATCH_SIZE):
+            batch = tickers[batch_start:batch_start + BATCH_SIZE]
+            yahoo_tickers = [clean_ticker_for_yahoo(t) for t in batch]
+            
+            # Cached tickers first, then one multi-ticker request for the rest
+            unique_tickers = list(dict.fromkeys(yahoo_tickers))
+            downloaded = {}
+            for yahoo_ticker in unique_tickers:
+                df = read_cached_fetch(yahoo_ticker, start_date, end_date)
+                if df is not None:
+                    downloaded[yahoo_ticker] = df
+            to_download = [y for y in unique_tickers if y not in downloaded]
+            if to_download:
+                fresh = download_tickers(to_download, start_date, end_date)
+                for yahoo_ticker, df in fresh.items():
+                    write_cached_fetch(yahoo_ticker, df, start_date, end_date)
+                downloaded.update(fresh)
+            
+            # Retry misses individually; results come back in input order
+            misses = [t for t, y in zip(batch, yahoo_tickers) if y not in downloaded]
+            retried = dict(zip(misses, executor.map(
+                lambda t: fetch_cleaned_ticker(t, start_date, end_date), misses
+            )))
+            
+            for ticker, yahoo_ticker in zip(batch, yahoo_tickers):
+                if yahoo_ticker in downloaded:
+                    df, error = downloaded[yahoo_ticker], None
+                else:
+                    yahoo_ticker, df, error = retried[ticker]
+                    if df is not None and len(df) > 0:
+                        write_cached_fetch(yahoo_ticker, df, start_date, end_date)
+                
+                i += 1
+                print(f"  [{i}/{total}] Fetching {ticker}...", end=" ")
+                
+                if df is not None and len(df) > 0:
+                    print(f"✓ ({len(df)} rows)")
+                    results["successful"].append({
+                        "original_ticker": ticker,
+                        "yahoo_ticker": yahoo_ticker,
+                        "rows": len(df),
+                        "date_min": df["Date"].min(),
+                        "date_max": df["Date"].max()
+                    })
+                    results["data_frames"].append(df)
+                    
+                    # Checkpoint as we go (header only on the first write)
+                    if checkpoint_path is not None:
+                        write_header = checkpoint is None
+                        if write_header:
+                            checkpoint = stack.enter_context(
+                                open(checkpoint_path, "w", newline="")
+                            )
+                        df.to_csv(checkpoint, header=write_header, index=False)
+                else:
+                    print(f"✗ ({error})")
+                    results["failed"].append({
+                        "ticker": ticker,
+                        "yahoo_ticker": yahoo_ticker,
+                        "error": error
+                    })
+            
+            # Sleep between batches to avoid rate limiting (not needed if all were cached)
+            if i < total and (to_download or misses):
+                print(f"\n  Sleeping {SLEEP_BETWEEN_BATCHES}s to avoid rate limiting...")
+                time.sleep(SLEEP_BETWEEN_BATCHES)
     
     return results
 
 
+def read_existing_keys(path, tickers):
+    """
+    Read the (Date, Ticker) pairs already stored for the given tickers.
+    
+    Only the two key columns of the stock CSV at path are read.
+    """
+    ticker_filter = pc.field("Ticker").isin(pa.array(tickers, pa.string()))
+    source = ds.dataset(
+        path,
+        format=ds.CsvFileFormat(convert_options=pv.ConvertOptions(
+            column_types={"Date": pa.timestamp("ns"), "Ticker": pa.string()}
+        ))
+    )
+    keys = source.to_table(columns=KEY_COLUMNS, filter=ticker_filter)
+    return keys.to_pandas().astype({"Date": "datetime64[ns]"})
+
+
+def drop_existing_keys(df, existing_keys):
+    """Drop rows of df whose (Date, Ticker) pair appears in existing_keys."""
+    if existing_keys.empty:
+        return df
+    
+    merged = df.merge(
+        existing_keys.drop_duplicates(), on=KEY_COLUMNS, how="left", indicator=True
+    )
+    return df.loc[(merged["_merge"] == "left_only").to_numpy()]
+
+
+def write_stock_parquet(stock_path, df_new, parquet_path):
+    """
+    Write a zstd Parquet copy of a stock CSV followed by new rows.
+    
+    The CSV is streamed in record batches into a single Parquet file, so it
+    is never fully in memory; df_new is written last, cast to the same schema.
+    """
+    convert_options = pv.ConvertOptions(column_types=STOCK_COLUMN_TYPES)
+    reader = pv.open_csv(stock_path, convert_options=convert_options)
+    with pq.ParquetWriter(parquet_path, reader.schema, compression="zstd") as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+        if not df_new.empty:
+            table = pa.Table.from_pandas(df_new, preserve_index=False)
+            writer.write_table(table.select(reader.schema.names).cast(reader.schema))
+
+
 def append_to_stock_data(new_data_frames, existing_stock_path, output_path):
-    """Append newly fetched data to existing stock data."""
+    """
+    Append newly fetched data to existing stock data.
+    
+    The existing CSV is not parsed: only its Date/Ticker columns are read to
+    skip rows that are already present (existing rows win), the file is copied
+    byte-for-byte to output_path, and the new rows are appended at the end,
+    sorted by Date and Ticker. A zstd Parquet copy of the result is written
+    next to output_path.
+    
+    Returns the DataFrame of rows that were appended.
+    """
     print(f"\nAppending new data to stock file...")
     
     # Combine all new data
@@ -237,43 +460,56 @@ def append_to_stock_data(new_data_frames, existing_stock_path, output_path):
     
     df_new = pd.concat(new_data_frames, ignore_index=True)
     
-    print(f"  New data: {len(df_new):,} rows across {df_new['Ticker'].nunique()} tickers")
-    
-    # Convert timezone-aware dates to timezone-naive to match existing data
-    if pd.api.types.is_datetime64_any_dtype(df_new["Date"]):
-        if hasattr(df_new["Date"].dtype, 'tz') and df_new["Date"].dtype.tz is not None:
-            print("  Converting timezone-aware dates to timezone-naive...")
-            df_new["Date"] = df_new["Date"].dt.tz_localize(None)
+    # Tickers as category: integer codes for the sort, dedup and key lookup below
+    df_new["Ticker"] = df_new["Ticker"].astype("category")
     
-    # Load existing data
-    print(f"  Loading existing data from {existing_stock_path}...")
-    df_existing = pd.read_csv(existing_stock_path, parse_dates=["Date"])
-    
-    print(f"  Existing data: {len(df_existing):,} rows")
-    
-    # Combine
-    df_combined = pd.concat([df_existing, df_new], ignore_index=True)
+    print(f"  New data: {len(df_new):,} rows across {df_new['Ticker'].nunique()} tickers")
     
-    # Remove duplicates (in case some tickers were already present)
-    original_len = len(df_combined)
-    df_combined = df_combined.drop_duplicates(subset=["Date", "Ticker"], keep="first")
-    duplicates_removed = original_len - len(df_combined)
+    # Convert timezone-aware dates to timezone-naive to match existing data;
+    # only parse if the frames did not already carry datetime64 dates
+    if not pd.api.types.is_datetime64_any_dtype(df_new["Date"]):
+        df_new["Date"] = pd.to_datetime(df_new["Date"], format="%Y-%m-%d", cache=True)
+    elif df_new["Date"].dt.tz is not None:
+        print("  Converting timezone-aware dates to timezone-naive...")
+        df_new["Date"] = df_new["Date"].dt.tz_localize(None)
+    
+    # Sort the new rows by date and ticker (on category codes, not strings)
+    df_new = df_new.sort_values(KEY_COLUMNS, kind="stable").reset_index(drop=True)
+    
+    # Remove duplicates (within the new data, and rows the existing file already has).
+    # The sort is stable, so duplicated() still keeps the first fetched row.
+    original_len = len(df_new)
+    df_new = df_new.loc[~df_new.duplicated(subset=KEY_COLUMNS)]
+    print(f"  Checking existing keys in {existing_stock_path}...")
+    existing_keys = read_existing_keys(
+        existing_stock_path, df_new["Ticker"].cat.categories.tolist()
+    )
+    df_new = drop_existing_keys(df_new, existing_keys).reset_index(drop=True)
+    duplicates_removed = original_len - len(df_new)
     
     if duplicates_removed > 0:
         print(f"  Removed {duplicates_removed:,} duplicate rows")
     
-    # Sort by date and ticker (convert to string to avoid sorting issues)
-    print("  Sorting combined data...")
-    df_combined["Date"] = pd.to_datetime(df_combined["Date"])
-    df_combined = df_combined.sort_values(["Date", "Ticker"]).reset_index(drop=True)
-    
-    # Save
+    # Copy the existing file as-is, then append the new rows in its column order
     print(f"  Saving to {output_path}...")
-    df_combined.to_csv(output_path, index=False)
+    shutil.copyfile(existing_stock_path, output_path)
+    columns = pd.read_csv(existing_stock_path, nrows=0).columns
+    with open(output_path, "rb+") as f:
+        f.seek(0, 2)
+        if f.tell() > 0:
+            f.seek(-1, 2)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    df_new.reindex(columns=columns).to_csv(output_path, mode="a", header=False, index=False)
+    
+    # Parquet copy of the same rows
+    parquet_path = str(Path(output_path).with_suffix(".parquet"))
+    print(f"  Saving Parquet copy to {parquet_path}...")
+    write_stock_parquet(existing_stock_path, df_new, parquet_path)
     
-    print(f"  ✓ Saved {len(df_combined):,} total rows")
+    print(f"  ✓ Appended {len(df_new):,} rows")
     
-    return df_combined
+    return df_new
 
 
 def write_report(stats, report_path):
@@ -287,7 +523,7 @@ def write_report(stats, report_path):
     
     total_rows_added = sum(s["rows"] for s in stats["successful"])
     
-    report = f"""# Yahoo Finance Fetch Report: Missing Congressional Trading Tickers
+    parts = [f"""# Yahoo Finance Fetch Report: Missing Congressional Trading Tickers
 
 **Generated:** {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 
@@ -314,43 +550,44 @@ This report documents the attempt to recover missing ticker data from Yahoo Fina
 
 ## Successfully Fetched Tickers ({total_successful})
 
-"""
+"""]
 
     if stats["successful"]:
-        report += "| Original Ticker | Yahoo Ticker | Rows | Date Range |\n"
-        report += "|----------------|--------------|------|------------|\n"
-        for s in stats["successful"]:
-            report += f"| {s['original_ticker']} | {s['yahoo_ticker']} | {s['rows']:,} | {s['date_min']} to {s['date_max']} |\n"
+        parts.append("| Original Ticker | Yahoo Ticker | Rows | Date Range |\n")
+        parts.append("|----------------|--------------|------|------------|\n")
+        parts.extend(
+            f"| {s['original_ticker']} | {s['yahoo_ticker']} | {s['rows']:,} | {s['date_min']} to {s['date_max']} |\n"
+            for s in stats["successful"]
+        )
     else:
-        report += "*No tickers were successfully fetched.*\n"
+        parts.append("*No tickers were successfully fetched.*\n")
     
-    report += f"\n---\n\n## Failed Fetches ({total_failed})\n\n"
+    parts.append(f"\n---\n\n## Failed Fetches ({total_failed})\n\n")
     
     if stats["failed"]:
-        report += "| Ticker | Yahoo Ticker | Error |\n"
-        report += "|--------|--------------|-------|\n"
+        parts.append("| Ticker | Yahoo Ticker | Error |\n")
+        parts.append("|--------|--------------|-------|\n")
         for f in stats["failed"][:100]:  # Limit to first 100 to keep report manageable
             error = f['error'][:50] + "..." if len(f['error']) > 50 else f['error']
-            report += f"| {f['ticker']} | {f['yahoo_ticker']} | {error} |\n"
+            parts.append(f"| {f['ticker']} | {f['yahoo_ticker']} | {error} |\n")
         
         if total_failed > 100:
-            report += f"\n*...and {total_failed - 100} more failed fetches (truncated for brevity)*\n"
+            parts.append(f"\n*...and {total_failed - 100} more failed fetches (truncated for brevity)*\n")
     else:
-        report += "*All attempted fetches were successful.*\n"
+        parts.append("*All attempted fetches were successful.*\n")
     
-    report += f"\n---\n\n## Skipped Tickers ({total_skipped})\n\n"
-    report += "These tickers were identified as invalid formats (bonds, CUSIPs, foreign tickers, etc.) and were not queried:\n\n"
+    parts.append(f"\n---\n\n## Skipped Tickers ({total_skipped})\n\n")
+    parts.append("These tickers were identified as invalid formats (bonds, CUSIPs, foreign tickers, etc.) and were not queried:\n\n")
     
     if stats["invalid_tickers"]:
         # Group by category for readability
-        report += "Examples (first 50):\n\n"
-        for ticker in stats["invalid_tickers"][:50]:
-            report += f"- {ticker}\n"
+        parts.append("Examples (first 50):\n\n")
+        parts.extend(f"- {ticker}\n" for ticker in stats["invalid_tickers"][:50])
         
         if total_skipped > 50:
-            report += f"\n*...and {total_skipped - 50} more skipped tickers*\n"
+            parts.append(f"\n*...and {total_skipped - 50} more skipped tickers*\n")
     
-    report += f"""
+    parts.append(f"""
 
 ---
 
@@ -359,11 +596,13 @@ This report documents the attempt to recover missing ticker data from Yahoo Fina
 - **Start Date**: {START_DATE}
 - **End Date**: {END_DATE}
 - **Batch Size**: {BATCH_SIZE}
+- **Concurrent Requests**: {MAX_WORKERS}
 - **Sleep Between Batches**: {SLEEP_BETWEEN_BATCHES}s
 
 ## Output Files
 
 - **Enhanced Stock Data**: `{OUTPUT_STOCK_PATH}`
+- **Enhanced Stock Data (Parquet)**: `{OUTPUT_STOCK_PARQUET_PATH}`
 - **Original Filtered Data**: `{FILTERED_STOCK_PATH}`
 
 ## Next Steps
@@ -382,10 +621,10 @@ rye run python /Users/caleb/Research/congress_trading/fetch_missing_tickers.py
 ```
 
 **Note**: Yahoo Finance API has rate limits. Large batches may require multiple runs or longer sleep times.
-"""
+""")
 
     with open(report_path, "w") as f:
-        f.write(report)
+        f.write("".join(parts))
     
     print(f"\nReport saved to: {report_path}")
 
@@ -412,19 +651,24 @@ def main():
     print(f"Fetching data for {len(valid_tickers)} tickers from Yahoo Finance")
     print(f"{'='*70}\n")
     
-    results = fetch_batch(valid_tickers, START_DATE, END_DATE)
+    # Fetched data is checkpointed to CHECKPOINT_PATH while fetching
+    results = fetch_batch(valid_tickers, START_DATE, END_DATE, CHECKPOINT_PATH)
     
-    # Save checkpoint of fetched data
     if results["data_frames"]:
-        checkpoint_path = "/Users/caleb/Research/congress_trading/data/derived/yahoo_fetch_checkpoint.csv"
-        print(f"\nSaving checkpoint of fetched data to {checkpoint_path}...")
-        df_checkpoint = pd.concat(results["data_frames"], ignore_index=True)
-        df_checkpoint.to_csv(checkpoint_path, index=False)
-        print(f"✓ Checkpoint saved ({len(df_checkpoint):,} rows)")
+        checkpoint_rows = sum(len(df) for df in results["data_frames"])
+        print(f"\n✓ Checkpoint saved to {CHECKPOINT_PATH} ({checkpoint_rows:,} rows)")
+        
+        # The recovery script (complete_yahoo_append) must be able to read it back
+        checkpoint_table = read_checkpoint(CHECKPOINT_PATH)
+        if checkpoint_table.num_rows != checkpoint_rows:
+            raise ValueError(
+                f"Checkpoint round-trip read {checkpoint_table.num_rows:,} rows, "
+                f"expected {checkpoint_rows:,}"
+            )
     
     # Step 4: Append to existing stock data
     if results["data_frames"]:
-        df_combined = append_to_stock_data(
+        df_appended = append_to_stock_data(
             results["data_frames"],
             FILTERED_STOCK_PATH,
             OUTPUT_STOCK_PATH
@@ -450,10 +694,10 @@ def main():
     print(f"Skipped (invalid): {len(invalid_tickers)} tickers")
     
     if results["data_frames"]:
-        total_new_rows = sum(len(df) for df in results["data_frames"])
-        print(f"Total new rows added: {total_new_rows:,}")
+        print(f"Total new rows added: {len(df_appended):,}")
         print(f"\nEnhanced stock data saved to:")
         print(f"  {OUTPUT_STOCK_PATH}")
+        print(f"  {OUTPUT_STOCK_PARQUET_PATH}")
     
     print(f"\nFetch report saved to:")
     print(f"  {REPORT_PATH}")
@@ -12,9 +12,15 @@ Date: 2025-11-09
 
 import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
 from pathlib import Path
 from datetime import datetime
 
+from csv_utils import format_dates_like_pandas, write_table_csv
+
 # Global constants
 RAW_CONGRESS_PATH = "/Users/caleb/Research/congress_trading/data/raw/congress_trading.csv"
 RAW_STOCK_PATH = "/Users/caleb/Research/congress_trading/data/derived/all_stock_data_filtered_enhanced.csv"
@@ -22,8 +28,22 @@ DERIVED_DIR = "/Users/caleb/Research/congress_trading/data/derived"
 OUT_CONGRESS_PATH = f"{DERIVED_DIR}/congress_trading_filtered_enhanced.csv"
 OUT_STOCK_PATH = f"{DERIVED_DIR}/all_stock_data_filtered_enhanced.csv"  # Already exists, will skip
 REPORT_PATH = f"{DERIVED_DIR}/data_filtering_report_enhanced.md"
+OUT_CONGRESS_PARQUET_PATH = os.path.splitext(OUT_CONGRESS_PATH)[0] + ".full.parquet"
 DATE_CUTOFF = "2012-01-01"
-CHUNKSIZE = 1_000_000
+BLOCK_SIZE = 256 << 20  # bytes of CSV per record batch
+STOCK_COLUMN_TYPES = {
+    "Date": pa.timestamp("ns"),
+    "Ticker": pa.string(),
+    "Open": pa.float64(),
+    "High": pa.float64(),
+    "Low": pa.float64(),
+    "Close": pa.float64(),
+    "Volume": pa.float64(),
+    "Dividends": pa.float64(),
+    "Stock Splits": pa.float64(),
+}
+OUTPUT_BUFFER_SIZE = 4 << 20  # bytes buffered before each write to disk
+CSV_WRITE_OPTIONS = pv.WriteOptions(quoting_style="none")
 
 
 def ensure_dir(path):
@@ -50,10 +70,38 @@ def format_pct(n_removed, n_total):
     return f"{(n_removed / n_total) * 100:.2f}%"
 
 
-def process_stock_data(raw_path, out_path, date_cutoff, chunksize):
+def update_date_range(stats, suffix, date_min, date_max):
+    """Widen stats["date_min_<suffix>"/"date_max_<suffix>"] to cover the given bounds."""
+    if not date_min.is_valid:
+        return
+    
+    batch_min = pd.Timestamp(date_min.as_py())
+    batch_max = pd.Timestamp(date_max.as_py())
+    if stats[f"date_min_{suffix}"] is None or batch_min < stats[f"date_min_{suffix}"]:
+        stats[f"date_min_{suffix}"] = batch_min
+    if stats[f"date_max_{suffix}"] is None or batch_max > stats[f"date_max_{suffix}"]:
+        stats[f"date_max_{suffix}"] = batch_max
+
+
+def unique_tickers(ticker_arrays):
+    """Return the set of non-null tickers across a list of Arrow arrays."""
+    if not ticker_arrays:
+        return set()
+    return set(pc.unique(pa.chunked_array(ticker_arrays)).drop_null().to_pylist())
+
+
+def process_stock_data(raw_path, out_path, date_cutoff, block_size):
     """
     Process stock data: filter by date and standardize tickers.
     
+    The CSV is streamed in record batches of about block_size bytes with the
+    Arrow CSV reader, filtered with Arrow compute kernels and written through
+    a single CSV writer on one buffered output stream. A Parquet copy with
+    the same rows is streamed next to out_path (".parquet" suffix) so later
+    steps can skip re-parsing the CSV. Output goes to temporary files that
+    replace the targets at the end, so out_path may be the same file as
+    raw_path.
+    
     Returns dict with pre/post statistics.
     """
     print("\n" + "="*70)
@@ -72,72 +120,96 @@ def process_stock_data(raw_path, out_path, date_cutoff, chunksize):
         "date_max_post": None,
     }
     
-    cutoff_date = pd.Timestamp(date_cutoff)
-    first_chunk = True
-    chunk_count = 0
+    cutoff_date = pa.scalar(pd.Timestamp(date_cutoff), type=pa.timestamp("ns"))
+    batch_count = 0
     
-    print(f"Reading stock data in chunks of {chunksize:,} rows...")
+    print(f"Reading stock data in blocks of {block_size / 2**20:,.0f} MiB...")
     
-    for chunk in pd.read_csv(
+    reader = pv.open_csv(
         raw_path,
-        parse_dates=["Date"],
-        dtype={"Ticker": "string"},
-        chunksize=chunksize,
-        low_memory=False
-    ):
-        chunk_count += 1
-        
-        # Standardize tickers
-        chunk["Ticker"] = standardize_ticker_series(chunk["Ticker"])
-        
-        # Update pre-filter statistics
-        stats["rows_pre"] += len(chunk)
-        valid_tickers = chunk["Ticker"].dropna().unique()
-        stats["tickers_pre"].update(valid_tickers)
-        
-        # Track date ranges (pre-filter)
-        chunk_dates = chunk["Date"].dropna()
-        if len(chunk_dates) > 0:
-            chunk_min = chunk_dates.min()
-            chunk_max = chunk_dates.max()
-            if stats["date_min_pre"] is None or chunk_min < stats["date_min_pre"]:
-                stats["date_min_pre"] = chunk_min
-            if stats["date_max_pre"] is None or chunk_max > stats["date_max_pre"]:
-                stats["date_max_pre"] = chunk_max
-        
-        # Filter by date
-        filtered = chunk[chunk["Date"] >= cutoff_date]
-        
-        # Update post-filter statistics
-        stats["rows_post"] += len(filtered)
-        valid_tickers_post = filtered["Ticker"].dropna().unique()
-        stats["tickers_post"].update(valid_tickers_post)
-        
-        # Track date ranges (post-filter)
-        filtered_dates = filtered["Date"].dropna()
-        if len(filtered_dates) > 0:
-            filt_min = filtered_dates.min()
-            filt_max = filtered_dates.max()
-            if stats["date_min_post"] is None or filt_min < stats["date_min_post"]:
-                stats["date_min_post"] = filt_min
-            if stats["date_max_post"] is None or filt_max > stats["date_max_post"]:
-                stats["date_max_post"] = filt_max
-        
-        # Write filtered chunk
-        if len(filtered) > 0:
-            filtered.to_csv(
-                out_path,
-                mode="w" if first_chunk else "a",
-                header=first_chunk,
-                index=False
+        read_options=pv.ReadOptions(use_threads=True, block_size=block_size),
+        convert_options=pv.ConvertOptions(
+            column_types=STOCK_COLUMN_TYPES,
+            timestamp_parsers=[pv.ISO8601],
+            strings_can_be_null=True
+        )
+    )
+    tmp_path = f"{out_path}.tmp"
+    parquet_path = os.path.splitext(out_path)[0] + ".parquet"
+    parquet_tmp_path = f"{parquet_path}.tmp"
+    sink = None
+    writer = None
+    parquet_writer = None
+    
+    # Per-batch unique tickers, merged once at the end
+    tickers_pre = []
+    tickers_post = []
+    
+    try:
+        for batch in reader:
+            batch_count += 1
+            
+            # Standardize tickers
+            ticker = pc.utf8_trim_whitespace(pc.utf8_upper(batch.column("Ticker")))
+            batch = batch.set_column(batch.schema.get_field_index("Ticker"), "Ticker", ticker)
+            
+            # Update pre-filter statistics
+            dates = batch.column("Date")
+            bounds = pc.min_max(dates)
+            stats["rows_pre"] += batch.num_rows
+            tickers_pre.append(pc.unique(ticker))
+            update_date_range(stats, "pre", bounds["min"], bounds["max"])
+            
+            # Filter by date (rows with missing dates are dropped)
+            filtered = batch.filter(pc.greater_equal(dates, cutoff_date))
+            
+            # Update post-filter statistics; the batch maximum survives the
+            # cutoff whenever any row does, so only the minimum is rescanned
+            stats["rows_post"] += filtered.num_rows
+            tickers_post.append(pc.unique(filtered.column("Ticker")))
+            if filtered.num_rows:
+                update_date_range(stats, "post", pc.min(filtered.column("Date")), bounds["max"])
+            
+            # Parquet copy keeps the typed timestamps
+            if parquet_writer is None:
+                parquet_writer = pq.ParquetWriter(
+                    parquet_tmp_path, filtered.schema, compression="zstd"
+                )
+            parquet_writer.write_batch(filtered)
+            
+            # Write filtered batch (dates formatted as pandas would)
+            date_idx = filtered.schema.get_field_index("Date")
+            filtered = filtered.set_column(
+                date_idx, "Date", format_dates_like_pandas(filtered.column("Date"))
             )
-            first_chunk = False
-        
-        if chunk_count % 5 == 0:
-            print(f"  Processed {chunk_count} chunks ({stats['rows_pre']:,} rows)")
-    
-    print(f"\nCompleted processing {chunk_count} chunks")
+            if writer is None:
+                sink = pa.output_stream(tmp_path, buffer_size=OUTPUT_BUFFER_SIZE)
+                writer = pv.CSVWriter(sink, filtered.schema, write_options=CSV_WRITE_OPTIONS)
+            writer.write_batch(filtered)
+            
+            if batch_count % 5 == 0:
+                print(f"  Processed {batch_count} blocks ({stats['rows_pre']:,} rows)")
+            
+            # Release this block before the reader decodes the next one
+            del batch, ticker, dates, filtered
+    finally:
+        if writer is not None:
+            writer.close()
+        if sink is not None:
+            sink.close()
+        if parquet_writer is not None:
+            parquet_writer.close()
+    
+    if writer is not None:
+        os.replace(tmp_path, out_path)
+        os.replace(parquet_tmp_path, parquet_path)
+    
+    stats["tickers_pre"] = unique_tickers(tickers_pre)
+    stats["tickers_post"] = unique_tickers(tickers_post)
+    
+    print(f"\nCompleted processing {batch_count} blocks")
     print(f"Saved filtered stock data to: {out_path}")
+    print(f"Saved Parquet copy to: {parquet_path}")
     
     return stats
 
@@ -191,8 +263,11 @@ def load_and_filter_congress(raw_path, allowed_tickers):
     if date_col:
         print(f"  Date range: {stats_pre['date_min']} to {stats_pre['date_max']}")
     
-    # Filter by allowed tickers
-    df_filtered = df[df["Ticker"].isin(allowed_tickers)].copy()
+    # Filter by allowed tickers: as a category over the allowed set, tickers
+    # outside it (and missing tickers) get code -1
+    allowed_dtype = pd.CategoricalDtype(categories=list(allowed_tickers))
+    is_allowed = df["Ticker"].astype(allowed_dtype).cat.codes.to_numpy() != -1
+    df_filtered = df[is_allowed]
     
     # Compute post-filter statistics
     stats_post = {
@@ -243,7 +318,7 @@ def write_markdown_report(stats, path):
     )
     
     # Build markdown content
-    report = f"""# Data Filtering Report: Congressional Trading & Stock Data
+    parts = [f"""# Data Filtering Report: Congressional Trading & Stock Data
 
 **Generated:** {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 
@@ -290,24 +365,24 @@ This report documents the data filtering process applied to align congressional
 - Total trades: **{stats["congress"]["pre"]["rows"]:,}**
 - Unique tickers: **{len(stats["congress"]["pre"]["tickers"]):,}**
 - Unique members: **{stats["congress"]["pre"]["unique_members"]:,}**
-"""
+"""]
 
     if stats["congress"]["date_col"]:
-        report += f"""- Trade date range: **{stats["congress"]["pre"]["date_min"]}** to **{stats["congress"]["pre"]["date_max"]}**
-"""
+        parts.append(f"""- Trade date range: **{stats["congress"]["pre"]["date_min"]}** to **{stats["congress"]["pre"]["date_max"]}**
+""")
 
-    report += f"""
+    parts.append(f"""
 **After Ticker Alignment:**
 - Total trades: **{stats["congress"]["post"]["rows"]:,}**
 - Unique tickers: **{len(stats["congress"]["post"]["tickers"]):,}**
 - Unique members: **{stats["congress"]["post"]["unique_members"]:,}**
-"""
+""")
 
     if stats["congress"]["date_col"]:
-        report += f"""- Trade date range: **{stats["congress"]["post"]["date_min"]}** to **{stats["congress"]["post"]["date_max"]}**
-"""
+        parts.append(f"""- Trade date range: **{stats["congress"]["post"]["date_min"]}** to **{stats["congress"]["post"]["date_max"]}**
+""")
 
-    report += f"""
+    parts.append(f"""
 **Removed:**
 - Trades: **{congress_rows_removed:,}** ({congress_rows_pct})
 - Tickers: **{congress_tickers_removed:,}** ({congress_tickers_pct})
@@ -328,13 +403,13 @@ This report documents the data filtering process applied to align congressional
 - **Trades**: {stats["congress"]["post"]["rows"]:,}
 - **Unique tickers**: {len(stats["congress"]["post"]["tickers"]):,}
 - **Unique members**: {stats["congress"]["post"]["unique_members"]:,}
-"""
+""")
 
     if stats["congress"]["date_col"]:
-        report += f"""- **Trade date range**: {stats["congress"]["post"]["date_min"]} to {stats["congress"]["post"]["date_max"]}
-"""
+        parts.append(f"""- **Trade date range**: {stats["congress"]["post"]["date_min"]} to {stats["congress"]["post"]["date_max"]}
+""")
 
-    report += f"""- **Member ID column**: `{stats["congress"]["member_col"]}`
+    parts.append(f"""- **Member ID column**: `{stats["congress"]["member_col"]}`
 
 ## Key Takeaways
 
@@ -348,7 +423,7 @@ This report documents the data filtering process applied to align congressional
 
 **Constants**:
 - `DATE_CUTOFF = "{DATE_CUTOFF}"`
-- `CHUNKSIZE = {CHUNKSIZE:,}`
+- `BLOCK_SIZE = {BLOCK_SIZE:,}` (bytes)
 
 **Run command**:
 ```bash
@@ -361,11 +436,11 @@ With aligned datasets, subsequent analysis can proceed to:
 1. Define sentiment spike events from news sentiment data
 2. Construct difference-in-differences design with appropriate controls
 3. Test for anticipatory trading volume increases before sentiment spikes
-"""
+""")
 
     # Write report
     with open(path, "w") as f:
-        f.write(report)
+        f.write("".join(parts))
     
     print(f"\nMarkdown report saved to: {path}")
 
@@ -376,7 +451,7 @@ def main():
     print("Congressional Trading & Stock Data Filtering Pipeline")
     print("="*70)
     print(f"Date cutoff: {DATE_CUTOFF}")
-    print(f"Chunk size: {CHUNKSIZE:,} rows")
+    print(f"Block size: {BLOCK_SIZE / 2**20:,.0f} MiB")
     
     # Ensure output directory exists
     ensure_dir(DERIVED_DIR)
@@ -386,7 +461,7 @@ def main():
         RAW_STOCK_PATH,
         OUT_STOCK_PATH,
         DATE_CUTOFF,
-        CHUNKSIZE
+        BLOCK_SIZE
     )
     
     # Print Step 1 summary
@@ -408,7 +483,13 @@ def main():
     
     # Save filtered congressional data
     print(f"\nSaving filtered congressional data to: {OUT_CONGRESS_PATH}")
-    df_congress_filtered.to_csv(OUT_CONGRESS_PATH, index=False)
+    write_table_csv(
+        pa.Table.from_pandas(df_congress_filtered, preserve_index=False), OUT_CONGRESS_PATH
+    )
+    print(f"Saving Parquet copy to: {OUT_CONGRESS_PARQUET_PATH}")
+    df_congress_filtered.to_parquet(
+        OUT_CONGRESS_PARQUET_PATH, engine="pyarrow", compression="zstd", index=False
+    )
     
     # Print Step 2 summary
     print("\n--- Step 2 Summary ---")
@@ -443,8 +524,8 @@ def main():
     print("FILTERING COMPLETE")
     print("="*70)
     print(f"\nOutput files:")
-    print(f"  1. {OUT_STOCK_PATH}")
-    print(f"  2. {OUT_CONGRESS_PATH}")
+    print(f"  1. {OUT_STOCK_PATH} (+ .parquet)")
+    print(f"  2. {OUT_CONGRESS_PATH} (+ .full.parquet)")
     print(f"  3. {REPORT_PATH}")
     print("\nReady for difference-in-differences analysis!")
 
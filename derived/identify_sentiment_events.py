@@ -9,7 +9,7 @@ by the largest single-day change after the local extremum.
 import pandas as pd
 import numpy as np
 import argparse
-from scipy.signal import argrelextrema
+from numpy.lib.stride_tricks import sliding_window_view
 
 # Global constants
 INPUT_PATH = "data/derived/news_sentiment_filtered.csv"
@@ -17,6 +17,7 @@ OUTPUT_PATH = "data/derived/news_sentiment_with_events.csv"
 WINDOW_DAYS = 20
 TOP_K = 3
 REVERSAL_DAYS = 10  # Default: look at 1-day change after extremum
+LOOKAHEAD_DAYS = 200  # How far ahead of a point N-day changes are considered
 SMOOTHING_WINDOW = 5  # Default: 5-day moving average for smoothing
 MIN_SEPARATION_DAYS = 30  # Minimum days between any two sentiment events
 SENTIMENT_COL_CANDIDATES = ["News.Sentiment", "News Sentiment", "sentiment", "News_Sentiment"]
@@ -67,7 +68,8 @@ def load_data(path):
     else:
         # Convert 2-digit year to 4-digit if needed
         if df['yr'].max() < 100:
-            df['yr'] = df['yr'].apply(lambda x: 2000 + x if x < 50 else 1900 + x)
+            yr = df['yr'].to_numpy()
+            df['yr'] = np.where(yr < 50, 2000 + yr, 1900 + yr)
     
     print(f"Loaded {len(df)} observations from {df['date'].min()} to {df['date'].max()}")
     print(f"Years covered: {sorted(df['yr'].unique())}")
@@ -102,11 +104,12 @@ def smooth_sentiment(df, sentiment_col='sentiment', smoothing_window=SMOOTHING_W
 
 def find_local_extrema(df, sentiment_col='sentiment', window=WINDOW_DAYS):
     """
-    Identify local minima and maxima using scipy.signal.argrelextrema.
+    Identify local minima and maxima in a single pass over the window.
     
-    A point is a local minimum if it's the smallest value within a window of
-    neighboring points. A local maximum is identified similarly for peaks.
-    This method is more robust than manual iteration.
+    A point is a local minimum if it's strictly smaller than every neighboring
+    point within the window, and a local maximum if it's strictly larger. This
+    matches scipy.signal.argrelextrema (mode='clip'), but both kinds of
+    extrema share each shifted comparison instead of scanning twice.
     
     Args:
         df: DataFrame with sentiment data
@@ -116,20 +119,23 @@ def find_local_extrema(df, sentiment_col='sentiment', window=WINDOW_DAYS):
     Returns:
         DataFrame with is_local_min and is_local_max boolean columns
     """
-    s = df[sentiment_col].values
+    s = df[sentiment_col].to_numpy(dtype=float)
     n = len(s)
     
-    # Initialize arrays
-    is_local_min = np.zeros(n, dtype=bool)
-    is_local_max = np.zeros(n, dtype=bool)
-    
-    # Find local minima using scipy (comparator: less than)
-    min_indices = argrelextrema(s, np.less, order=window)[0]
-    is_local_min[min_indices] = True
-    
-    # Find local maxima using scipy (comparator: greater than)
-    max_indices = argrelextrema(s, np.greater, order=window)[0]
-    is_local_max[max_indices] = True
+    # Endpoints compare against themselves under clipping, so never qualify
+    is_local_min = np.ones(n, dtype=bool)
+    is_local_max = np.ones(n, dtype=bool)
+    if n:
+        is_local_min[[0, -1]] = False
+        is_local_max[[0, -1]] = False
+    
+    # Compare each point with the neighbors `shift` days before and after
+    for shift in range(1, min(window, n - 1) + 1):
+        earlier, later = s[:-shift], s[shift:]
+        is_local_min[:-shift] &= earlier < later
+        is_local_min[shift:] &= later < earlier
+        is_local_max[:-shift] &= earlier > later
+        is_local_max[shift:] &= later > earlier
     
     df['is_local_min'] = is_local_min
     df['is_local_max'] = is_local_max
@@ -148,6 +154,8 @@ def compute_extremity_scores(df, sentiment_col='sentiment', reversal_days=REVERS
     For minima: largest positive N-day change after the minimum
     For maxima: largest negative N-day change (in absolute value) after the maximum
     
+    Only points flagged by find_local_extrema are scored; all others are 0.
+    
     Args:
         df: DataFrame with sentiment data and extrema indicators
         sentiment_col: Name of sentiment column
@@ -156,30 +164,36 @@ def compute_extremity_scores(df, sentiment_col='sentiment', reversal_days=REVERS
     Returns:
         DataFrame with extremity_score_min and extremity_score_max columns
     """
-    s = df[sentiment_col].values
+    s = df[sentiment_col].to_numpy(dtype=float)
     n = len(s)
     
     # Initialize extremity score arrays
     extremity_min = np.zeros(n)
     extremity_max = np.zeros(n)
     
-    # For each point, calculate the maximum N-day change in the future
-    for i in range(n - reversal_days):
-        # Look at all N-day changes from this point forward
-        future_changes = []
-        for j in range(i + reversal_days, min(n, i + 200)):  # Look up to 200 days ahead
-            if j - reversal_days >= 0:
-                n_day_change = s[j] - s[j - reversal_days]
-                future_changes.append(n_day_change)
+    # Point i looks at the N-day changes ending on days i+N .. i+LOOKAHEAD_DAYS-1,
+    # i.e. diff[i : i + n_changes] (only points with at least one change are scored)
+    n_scored = n - reversal_days
+    n_changes = LOOKAHEAD_DAYS - reversal_days
+    if n_scored > 0 and n_changes > 0:
+        diff = s[reversal_days:] - s[:n_scored]
+        
+        # Positive and negative changes; anything else (incl. NaN) counts as 0
+        gains = np.where(diff > 0, diff, 0.0)
+        losses = np.where(diff < 0, -diff, 0.0)
+        
+        # Only extrema are ever ranked, so other points keep a score of 0
+        is_extremum = df['is_local_min'].to_numpy() | df['is_local_max'].to_numpy()
+        extrema_idx = np.flatnonzero(is_extremum[:n_scored])
         
-        if future_changes:
-            # For minima: find largest positive N-day change
-            max_positive_change = max([c for c in future_changes if c > 0], default=0)
-            extremity_min[i] = max_positive_change
-            
-            # For maxima: find largest negative N-day change (absolute value)
-            min_negative_change = min([c for c in future_changes if c < 0], default=0)
-            extremity_max[i] = abs(min_negative_change)
+        # Forward-looking max over each extremum's window (zero padding past the end)
+        padding = np.zeros(n_changes - 1)
+        extremity_min[extrema_idx] = sliding_window_view(
+            np.concatenate([gains, padding]), n_changes
+        )[extrema_idx].max(axis=1)
+        extremity_max[extrema_idx] = sliding_window_view(
+            np.concatenate([losses, padding]), n_changes
+        )[extrema_idx].max(axis=1)
     
     df['extremity_score_min'] = extremity_min
     df['extremity_score_max'] = extremity_max
@@ -202,35 +216,18 @@ def select_top_events_by_year(df, top_k=TOP_K):
     df['local_min'] = 0
     df['local_max'] = 0
     
-    # Process each year separately
-    for year in sorted(df['yr'].unique()):
-        year_mask = df['yr'] == year
-        
-        # Select top K minima for this year
-        min_candidates = df[year_mask & df['is_local_min']].copy()
-        if len(min_candidates) > 0:
-            min_candidates = min_candidates.sort_values(
-                ['extremity_score_min', 'date'],
-                ascending=[False, True]
-            )
-            top_mins = min_candidates.head(top_k)
-            df.loc[top_mins.index, 'local_min'] = 1
-        
-        # Select top K maxima for this year
-        max_candidates = df[year_mask & df['is_local_max']].copy()
-        if len(max_candidates) > 0:
-            max_candidates = max_candidates.sort_values(
-                ['extremity_score_max', 'date'],
-                ascending=[False, True]
-            )
-            top_maxs = max_candidates.head(top_k)
-            df.loc[top_maxs.index, 'local_max'] = 1
+    # Top K candidates per year (ties go to the earlier date, as df is date-sorted)
+    for candidate_col, score_col, event_col in (
+        ('is_local_min', 'extremity_score_min', 'local_min'),
+        ('is_local_max', 'extremity_score_max', 'local_max'),
+    ):
+        top = df.loc[df[candidate_col]].groupby('yr')[score_col].nlargest(top_k)
+        df.loc[top.index.get_level_values(-1), event_col] = 1
     
     # Print summary
     print("\nSelected events by year:")
-    for year in sorted(df['yr'].unique()):
-        n_mins = df[(df['yr'] == year) & (df['local_min'] == 1)].shape[0]
-        n_maxs = df[(df['yr'] == year) & (df['local_max'] == 1)].shape[0]
+    counts = df.groupby('yr')[['local_min', 'local_max']].sum()
+    for year, n_mins, n_maxs in counts.itertuples():
         print(f"  {year}: {n_mins} minima, {n_maxs} maxima")
     
     return df
@@ -367,11 +364,8 @@ def validate_results(df, top_k=TOP_K):
         top_k: Expected maximum events per type per year
     """
     # Check that no year has more than top_k events
-    for year in df['yr'].unique():
-        year_data = df[df['yr'] == year]
-        n_mins = (year_data['local_min'] == 1).sum()
-        n_maxs = (year_data['local_max'] == 1).sum()
-        
+    counts = (df[['local_min', 'local_max']] == 1).groupby(df['yr']).sum()
+    for year, n_mins, n_maxs in counts.itertuples():
         assert n_mins <= top_k, f"Year {year} has {n_mins} minima (max: {top_k})"
         assert n_maxs <= top_k, f"Year {year} has {n_maxs} maxima (max: {top_k})"
     
@@ -394,13 +388,12 @@ def build_output_and_save(df, output_path=OUTPUT_PATH):
         output_path: Path to save output CSV
     """
     # Create a unified extremity_score column for easy inspection
-    df['extremity_score'] = np.nan
-    df.loc[df['local_min'] == 1, 'extremity_score'] = df.loc[
-        df['local_min'] == 1, 'extremity_score_min'
-    ]
-    df.loc[df['local_max'] == 1, 'extremity_score'] = df.loc[
-        df['local_max'] == 1, 'extremity_score_max'
-    ]
+    # (a date that is both a selected minimum and maximum takes the max score)
+    df['extremity_score'] = np.where(
+        df['local_max'] == 1,
+        df['extremity_score_max'],
+        np.where(df['local_min'] == 1, df['extremity_score_min'], np.nan)
+    )
     
     # Drop intermediate working columns
     cols_to_drop = ['sentiment', 'sentiment_smoothed', 'is_local_min', 'is_local_max', 
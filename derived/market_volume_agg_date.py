@@ -40,12 +40,17 @@ Date: 2025-11-12
 """
 
 import warnings
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Union, Optional, Tuple
+from typing import NamedTuple, Union, Optional
 import argparse
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
 
 
 # Global constants
@@ -55,6 +60,8 @@ DATE_COL = "Date"
 TICKER_COL = "Ticker"
 VOLUME_COL = "Volume"
 OUTPUT_DATE_COL = "Date"
+LOADED_DATA_CACHE_SIZE = 4
+CACHE_SUFFIX = ".indexes.parquet"
 
 # Major market index ETFs to track
 INDEX_TICKERS = {
@@ -65,6 +72,17 @@ INDEX_TICKERS = {
     "VOO": "Vanguard_SP500_Volume",
     "VTI": "Total_Market_Volume"
 }
+INDEX_TICKER_LIST = list(INDEX_TICKERS)
+INDEX_TICKER_VALUE_SET = pa.array(INDEX_TICKER_LIST, type=pa.string())
+INDEX_VOLUME_COLS = np.array(list(INDEX_TICKERS.values()), dtype=object)
+INDEX_COLUMN_ORDER = np.argsort(INDEX_VOLUME_COLS)  # ticker codes by friendly name
+
+
+class IndexVolumeArrays(NamedTuple):
+    """Index volume rows as parallel arrays, sorted by date."""
+    dates: np.ndarray  # datetime64[ns], normalized to midnight
+    ticker_codes: np.ndarray  # int8 positions in INDEX_TICKERS
+    volumes: np.ndarray  # float64
 
 
 def parse_date_input(date_input: Union[str, pd.Timestamp, pd.DatetimeIndex]) -> pd.Timestamp:
@@ -81,6 +99,10 @@ def parse_date_input(date_input: Union[str, pd.Timestamp, pd.DatetimeIndex]) ->
     Raises:
         ValueError: If date cannot be parsed
     """
+    # Values that are already datetimes (incl. Timestamp) need no parsing
+    if isinstance(date_input, (datetime, np.datetime64)) and not pd.isna(date_input):
+        return pd.Timestamp(date_input).normalize()
+    
     try:
         parsed_date = pd.to_datetime(date_input, errors="coerce")
         
@@ -96,15 +118,23 @@ def parse_date_input(date_input: Union[str, pd.Timestamp, pd.DatetimeIndex]) ->
         raise ValueError(f"Error parsing date input '{date_input}': {str(e)}")
 
 
-def load_index_volume_data(data_path: Path = STOCK_DATA_PATH) -> pd.DataFrame:
+def load_index_volume_data(
+    data_path: Path = STOCK_DATA_PATH,
+    use_cache: bool = True
+) -> pd.DataFrame:
     """
     Load stock data and filter to major market indices.
     
+    With use_cache, the filtered index rows are cached next to the CSV as a
+    small Parquet file, reused for as long as it is newer than the CSV.
+    
     Args:
         data_path: Path to stock data CSV file
+        use_cache: Whether to read/write the Parquet cache (default True)
     
     Returns:
-        DataFrame with Date, Ticker, and Volume columns for index ETFs
+        DataFrame with Date (normalized to midnight), Ticker, and Volume
+        columns for index ETFs
     
     Raises:
         FileNotFoundError: If data file doesn't exist
@@ -113,21 +143,42 @@ def load_index_volume_data(data_path: Path = STOCK_DATA_PATH) -> pd.DataFrame:
     if not data_path.exists():
         raise FileNotFoundError(f"Stock data file not found: {data_path}")
     
-    # Load only necessary columns for efficiency
+    cache_path = data_path.with_suffix(CACHE_SUFFIX)
+    
+    if (
+        use_cache
+        and cache_path.exists()
+        and cache_path.stat().st_mtime >= data_path.stat().st_mtime
+    ):
+        return pd.read_parquet(cache_path, engine="pyarrow")
+    
+    # Load only necessary columns for efficiency; all are read as strings so
+    # dates and volumes are parsed (and coerced) only for the rows kept
     required_cols = [DATE_COL, TICKER_COL, VOLUME_COL]
+    convert_options = pv.ConvertOptions(
+        include_columns=required_cols,
+        column_types={col: pa.string() for col in required_cols},
+        strings_can_be_null=True
+    )
     
+    # Stream the CSV and keep only index ticker rows from each block
     try:
-        df = pd.read_csv(
-            data_path, 
-            usecols=required_cols,
-            dtype={TICKER_COL: "string"},
-            low_memory=False
+        reader = pv.open_csv(data_path, convert_options=convert_options)
+        table = pa.Table.from_batches(
+            (
+                batch.filter(pc.is_in(batch.column(TICKER_COL), value_set=INDEX_TICKER_VALUE_SET))
+                for batch in reader
+            ),
+            schema=reader.schema
         )
-    except ValueError as e:
+    except (pa.ArrowInvalid, pa.ArrowKeyError) as e:
         raise KeyError(f"Required columns missing from stock data: {required_cols}") from e
     
-    # Parse dates
-    df[DATE_COL] = pd.to_datetime(df[DATE_COL], errors="coerce")
+    df = table.to_pandas()
+    df[TICKER_COL] = df[TICKER_COL].astype("string")
+    
+    # Parse dates, normalized to midnight once here rather than per window
+    df[DATE_COL] = pd.to_datetime(df[DATE_COL], errors="coerce").dt.normalize()
     initial_rows = len(df)
     df = df.dropna(subset=[DATE_COL])
     dropped_dates = initial_rows - len(df)
@@ -135,13 +186,9 @@ def load_index_volume_data(data_path: Path = STOCK_DATA_PATH) -> pd.DataFrame:
     if dropped_dates > 0:
         warnings.warn(f"Dropped {dropped_dates} rows with invalid dates")
     
-    # Filter to index tickers only
-    index_ticker_list = list(INDEX_TICKERS.keys())
-    df = df[df[TICKER_COL].isin(index_ticker_list)].copy()
-    
     if len(df) == 0:
         warnings.warn(
-            f"No data found for index tickers: {index_ticker_list}. "
+            f"No data found for index tickers: {INDEX_TICKER_LIST}. "
             "Market volume data will be empty."
         )
         return df
@@ -150,89 +197,42 @@ def load_index_volume_data(data_path: Path = STOCK_DATA_PATH) -> pd.DataFrame:
     df[VOLUME_COL] = pd.to_numeric(df[VOLUME_COL], errors="coerce")
     df = df.dropna(subset=[VOLUME_COL])
     
-    return df
-
-
-def filter_date_window(
-    df: pd.DataFrame, 
-    date_col: str, 
-    anchor_date: pd.Timestamp, 
-    window_days: int
-) -> Tuple[pd.DataFrame, pd.DatetimeIndex]:
-    """
-    Filter DataFrame to ±window_days around anchor date.
+    if use_cache:
+        try:
+            df.to_parquet(cache_path, engine="pyarrow", compression="zstd", index=False)
+        except OSError as e:
+            warnings.warn(f"Could not write Parquet cache {cache_path}: {e}")
     
-    Args:
-        df: DataFrame with date column
-        date_col: Name of date column
-        anchor_date: Center date for window
-        window_days: Number of days before and after anchor date
-    
-    Returns:
-        Tuple of (filtered DataFrame, complete date range index)
-    """
-    start_date = anchor_date - pd.Timedelta(days=window_days)
-    end_date = anchor_date + pd.Timedelta(days=window_days)
-    
-    # Normalize dates
-    df[date_col] = df[date_col].dt.normalize()
-    
-    # Filter to window
-    df_window = df[
-        (df[date_col] >= start_date) & 
-        (df[date_col] <= end_date)
-    ].copy()
-    
-    # Create complete date range for full window
-    full_index = pd.date_range(
-        start_date.normalize(), 
-        end_date.normalize(), 
-        freq="D"
-    )
-    
-    return df_window, full_index
+    return df
 
 
-def aggregate_by_date_index(
-    df_window: pd.DataFrame, 
-    date_col: str, 
-    ticker_col: str, 
-    volume_col: str
-) -> pd.DataFrame:
+@lru_cache(maxsize=LOADED_DATA_CACHE_SIZE)
+def _load_index_volume_data_cached(
+    data_path: Path,
+    mtime_ns: Optional[int],
+    use_cache: bool
+) -> IndexVolumeArrays:
     """
-    Aggregate volumes by date and index ticker.
-    
-    Args:
-        df_window: Filtered DataFrame with index volumes in window
-        date_col: Name of date column
-        ticker_col: Name of ticker column
-        volume_col: Name of volume column
+    Memoized load_index_volume_data, keyed on the file's modification time.
     
-    Returns:
-        Wide DataFrame with Date and one column per index
+    The rows are kept as parallel arrays (dates, int8 ticker codes and
+    volumes) sorted by date, so date windows touch no DataFrame. Repeated
+    windows (e.g. one per event in create_panel.py) share the same arrays, so
+    callers must not modify them in place. A changed file has a new mtime_ns
+    and is loaded again.
     """
-    if len(df_window) == 0:
-        # Return empty DataFrame with correct structure
-        return pd.DataFrame(columns=[OUTPUT_DATE_COL])
-    
-    # Group by date and ticker, sum volumes (in case of duplicates)
-    grouped = df_window.groupby([date_col, ticker_col])[volume_col].sum().reset_index()
-    
-    # Pivot to wide format: dates as rows, tickers as columns
-    pivot = grouped.pivot(
-        index=date_col, 
-        columns=ticker_col, 
-        values=volume_col
+    df = load_index_volume_data(data_path, use_cache)
+    dates = df[DATE_COL].to_numpy()
+    order = np.argsort(dates, kind="stable")
+    ticker_codes = pd.Categorical(
+        df[TICKER_COL], categories=INDEX_TICKER_LIST
+    ).codes.astype(np.int8)
+    
+    return IndexVolumeArrays(
+        dates=dates[order],
+        ticker_codes=ticker_codes[order],
+        volumes=df[VOLUME_COL].to_numpy(dtype=np.float64)[order]
     )
-    
-    # Rename columns using friendly names from INDEX_TICKERS
-    pivot = pivot.rename(columns=INDEX_TICKERS)
-    
-    # Reset index to make date a column
-    pivot = pivot.reset_index()
-    pivot = pivot.rename(columns={date_col: OUTPUT_DATE_COL})
-    
-    return pivot
 
 
 def reindex_full_window(
@@ -277,25 +277,92 @@ def reindex_full_window(
     return out_df[column_order]
 
 
+def build_window_volumes(
+    data: IndexVolumeArrays,
+    anchor_date: pd.Timestamp,
+    window_days: int
+) -> pd.DataFrame:
+    """
+    Build the full-window wide volume table in one pass.
+    
+    The window is located by binary search in the sorted dates and its rows
+    are binned straight into a (days x tickers) matrix over the whole
+    window, with no intermediate frames.
+    
+    Args:
+        data: Index volume arrays from the cached loader
+        anchor_date: Center date for window
+        window_days: Number of days before and after anchor date
+    
+    Returns:
+        Wide DataFrame with Date and one column per index present in the window
+    """
+    # Window bounds as NumPy datetimes
+    anchor = anchor_date.to_datetime64().astype("datetime64[ns]")
+    delta = np.timedelta64(window_days, "D")
+    start_date = anchor - delta
+    end_date = anchor + delta
+    
+    # Every calendar day of the window, used as the output Date column
+    window_dates = start_date + np.arange(2 * window_days + 1) * np.timedelta64(1, "D")
+    
+    # Locate the window bounds in the sorted dates
+    lo = np.searchsorted(data.dates, start_date, side="left")
+    hi = np.searchsorted(data.dates, end_date, side="right")
+    
+    if lo == hi:
+        return reindex_full_window(pd.DataFrame(columns=[OUTPUT_DATE_COL]), window_dates)
+    
+    # Day offsets into the window
+    day_codes = (data.dates[lo:hi] - start_date).astype("timedelta64[D]").astype(np.int64)
+    ticker_codes = data.ticker_codes[lo:hi]
+    
+    # Sum volumes (in case of duplicates): days as rows, tickers as columns,
+    # binned over flat (day, ticker) cell numbers
+    shape = (len(window_dates), len(INDEX_TICKERS))
+    cells = day_codes * shape[1] + ticker_codes
+    volumes = np.bincount(cells, weights=data.volumes[lo:hi], minlength=shape[0] * shape[1]).reshape(shape)
+    has_rows = np.bincount(cells, minlength=shape[0] * shape[1]).reshape(shape) > 0
+    
+    # Days with no rows stay 0; a ticker missing on a day with other rows is NaN
+    volumes[has_rows.any(axis=1)[:, None] & ~has_rows] = np.nan
+    
+    # Keep the tickers present in the window, alphabetically by friendly name
+    present = has_rows.any(axis=0)
+    order = INDEX_COLUMN_ORDER[present[INDEX_COLUMN_ORDER]]
+    volumes = volumes[:, order]
+    
+    # Whole-share volumes with no gaps stay int64, as read from the CSV
+    if not np.isnan(volumes).any() and np.array_equal(volumes, np.trunc(volumes)):
+        volumes = volumes.astype(np.int64)
+    result = pd.DataFrame(volumes, columns=INDEX_VOLUME_COLS[order])
+    
+    # Date first
+    result.insert(0, OUTPUT_DATE_COL, window_dates)
+    
+    return result
+
+
 def get_market_volumes(
     date_input: Union[str, pd.Timestamp],
     window_days: int = DEFAULT_DATE_WINDOW_DAYS,
-    data_path: Path = STOCK_DATA_PATH
+    data_path: Path = STOCK_DATA_PATH,
+    use_cache: bool = True
 ) -> pd.DataFrame:
     """
     Get market index volume data for a date window.
     
     Main function that orchestrates the full data processing pipeline:
     1. Parses input date
-    2. Loads stock data for major indices
-    3. Filters to date window
-    4. Aggregates by date and index
-    5. Ensures all dates in window are present
+    2. Loads stock data for major indices (from the Parquet cache when fresh;
+       reused across calls until the CSV changes)
+    3. Sums volumes by date and index over every day of the window
     
     Args:
         date_input: Center date for window (string or Timestamp)
         window_days: Number of days before and after date (default 30)
         data_path: Path to stock data CSV (default STOCK_DATA_PATH)
+        use_cache: Whether to use the Parquet cache of the index rows (default True)
     
     Returns:
         Wide-format DataFrame with:
@@ -311,24 +378,12 @@ def get_market_volumes(
     # Parse input date
     anchor_date = parse_date_input(date_input)
     
-    # Load index volume data
-    df = load_index_volume_data(data_path)
+    # Load index volume data (once per file version; later calls reuse it)
+    mtime_ns = data_path.stat().st_mtime_ns if data_path.exists() else None
+    data = _load_index_volume_data_cached(data_path, mtime_ns, use_cache)
     
-    # Filter to date window
-    df_window, full_index = filter_date_window(df, DATE_COL, anchor_date, window_days)
-    
-    # Aggregate by date and index
-    result = aggregate_by_date_index(
-        df_window, 
-        DATE_COL, 
-        TICKER_COL, 
-        VOLUME_COL
-    )
-    
-    # Reindex to ensure all dates in window are present
-    result = reindex_full_window(result, full_index)
-    
-    return result
+    # Filter, aggregate and reindex to the full date window in one pass
+    return build_window_volumes(data, anchor_date, window_days)
 
 
 def main(
@@ -336,7 +391,8 @@ def main(
     window_days: int = DEFAULT_DATE_WINDOW_DAYS,
     data_path: Path = STOCK_DATA_PATH,
     output_path: Optional[Union[str, Path]] = None,
-    return_df: bool = True
+    return_df: bool = True,
+    use_cache: bool = True
 ) -> Optional[pd.DataFrame]:
     """
     Main execution function for market volume aggregation.
@@ -347,12 +403,13 @@ def main(
         data_path: Path to stock data CSV (default STOCK_DATA_PATH)
         output_path: Optional path to save CSV output
         return_df: Whether to return DataFrame (default True)
+        use_cache: Whether to use the Parquet cache of the index rows (default True)
     
     Returns:
         DataFrame if return_df=True, otherwise None
     """
     # Get market volumes
-    df = get_market_volumes(date_input, window_days, data_path)
+    df = get_market_volumes(date_input, window_days, data_path, use_cache)
     
     # Save to CSV if output path provided
     if output_path is not None:
@@ -398,6 +455,12 @@ if __name__ == "__main__":
         help="Optional path to save CSV output"
     )
     
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-read the CSV instead of using (or writing) the Parquet cache"
+    )
+    
     args = parser.parse_args()
     
     # Parse date and compute window
@@ -410,13 +473,14 @@ if __name__ == "__main__":
     print(f"  Window: {start_date.date()} to {end_date.date()} ({args.window*2 + 1} days)")
     print(f"  Indices: {', '.join(INDEX_TICKERS.keys())}")
     
-    # Run main function
+    # Run main function (with the already-parsed date)
     df = main(
-        date_input=args.date,
+        date_input=anchor_date,
         window_days=args.window,
         data_path=Path(args.data_path),
         output_path=args.output,
-        return_df=True
+        return_df=True,
+        use_cache=not args.no_cache
     )
     
     print(f"\nResult:")
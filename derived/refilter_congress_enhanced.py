@@ -10,18 +10,95 @@ Date: 2025-11-09
 """
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+import os
+import warnings
 from datetime import datetime
 
+from csv_utils import write_table_csv
+
 # Global constants
 RAW_CONGRESS_PATH = "/Users/caleb/Research/congress_trading/data/raw/congress_trading.csv"
 ENHANCED_STOCK_PATH = "/Users/caleb/Research/congress_trading/data/derived/all_stock_data_filtered_enhanced.csv"
 OUT_CONGRESS_PATH = "/Users/caleb/Research/congress_trading/data/derived/congress_trading_filtered_enhanced.csv"
+OUT_CONGRESS_PARQUET_PATH = os.path.splitext(OUT_CONGRESS_PATH)[0] + ".full.parquet"
 REPORT_PATH = "/Users/caleb/Research/congress_trading/data/derived/congress_refilter_report.md"
+FIRST_PASS_CONGRESS_PATH = "/Users/caleb/Research/congress_trading/data/derived/congress_trading_filtered.csv"
+FIRST_PASS_TICKERS_CACHE_PATH = os.path.splitext(FIRST_PASS_CONGRESS_PATH)[0] + ".tickers.parquet"
 
 
 def standardize_ticker_series(series):
-    """Standardize ticker symbols to uppercase and strip whitespace."""
-    return series.astype("string").str.upper().str.strip()
+    """
+    Standardize ticker symbols to uppercase and strip whitespace.
+    
+    Runs on the Arrow string array; returns a pandas string[pyarrow] Series.
+    """
+    tickers = pa.array(series.astype("string[pyarrow]"))
+    tickers = pc.utf8_trim_whitespace(pc.utf8_upper(tickers))
+    return pd.Series(pd.arrays.ArrowStringArray(tickers), index=series.index, name=series.name)
+
+
+def load_first_pass_tickers():
+    """
+    Load the standardized Ticker column of the first-pass filtered data.
+    
+    The column is cached next to the CSV as a small Parquet file, reused for
+    as long as it is newer than the CSV, so repeated runs skip the CSV parse.
+    """
+    if (
+        os.path.exists(FIRST_PASS_TICKERS_CACHE_PATH)
+        and os.path.getmtime(FIRST_PASS_TICKERS_CACHE_PATH) >= os.path.getmtime(FIRST_PASS_CONGRESS_PATH)
+    ):
+        return pd.read_parquet(FIRST_PASS_TICKERS_CACHE_PATH, engine="pyarrow")["Ticker"]
+    
+    df_first_pass = pd.read_csv(
+        FIRST_PASS_CONGRESS_PATH,
+        engine="pyarrow",
+        usecols=["Ticker"],
+        dtype={"Ticker": "string"}
+    )
+    df_first_pass["Ticker"] = standardize_ticker_series(df_first_pass["Ticker"])
+    
+    try:
+        df_first_pass.to_parquet(
+            FIRST_PASS_TICKERS_CACHE_PATH, engine="pyarrow", compression="zstd", index=False
+        )
+    except OSError as e:
+        warnings.warn(f"Could not write Parquet cache {FIRST_PASS_TICKERS_CACHE_PATH}: {e}")
+    
+    return df_first_pass["Ticker"]
+
+
+def write_filtered_congress(columns, is_available, df_filtered, date_col):
+    """
+    Write the available rows of the raw congress CSV with all its columns.
+    
+    The raw file is re-read with every column as text and filtered by
+    is_available, so columns this script never looks at are copied through
+    without a pandas round trip. Ticker and the date column are replaced by
+    their standardized/parsed values from df_filtered. A Parquet copy with
+    the same columns is written next to the CSV as ".full.parquet", so it
+    never shadows the ".agg_cache.parquet" cache of cong_agg_date.
+    """
+    convert_options = pv.ConvertOptions(
+        column_types={col: pa.string() for col in columns},
+        strings_can_be_null=True
+    )
+    table = pv.read_csv(RAW_CONGRESS_PATH, convert_options=convert_options)
+    table = table.filter(pa.array(is_available))
+    
+    for col in ["Ticker"] + ([date_col] if date_col else []):
+        table = table.set_column(
+            table.schema.get_field_index(col), col, pa.array(df_filtered[col])
+        )
+    
+    print(f"\nSaving filtered congressional data to {OUT_CONGRESS_PATH}...")
+    write_table_csv(table, OUT_CONGRESS_PATH)
+    print(f"Saving Parquet copy to {OUT_CONGRESS_PARQUET_PATH}...")
+    pq.write_table(table, OUT_CONGRESS_PARQUET_PATH, compression="zstd")
 
 
 def get_member_id_col(df):
@@ -39,60 +116,74 @@ def main():
     
     # Load enhanced stock data to get available tickers
     print("\nLoading enhanced stock data...")
-    df_stock = pd.read_csv(ENHANCED_STOCK_PATH, usecols=["Ticker"], dtype={"Ticker": "string"})
+    df_stock = pd.read_csv(
+        ENHANCED_STOCK_PATH,
+        engine="pyarrow",
+        usecols=["Ticker"],
+        dtype={"Ticker": "string"}
+    )
     df_stock["Ticker"] = standardize_ticker_series(df_stock["Ticker"])
-    stock_tickers = set(df_stock["Ticker"].dropna().unique())
+    stock_tickers = df_stock["Ticker"].dropna().unique()
     print(f"  Available tickers: {len(stock_tickers):,}")
     
     # Load original congressional trading data
     print("\nLoading original congressional trading data...")
-    df_congress = pd.read_csv(RAW_CONGRESS_PATH, dtype={"Ticker": "string"})
-    
-    # Parse dates
-    if "Traded" in df_congress.columns:
-        df_congress["Traded"] = pd.to_datetime(df_congress["Traded"], errors="coerce")
-        date_col = "Traded"
-    elif "Filed" in df_congress.columns:
-        df_congress["Filed"] = pd.to_datetime(df_congress["Filed"], errors="coerce")
-        date_col = "Filed"
-    else:
-        date_col = None
+    # Read the header only, so the stats pass loads just the columns it uses
+    header = pd.read_csv(RAW_CONGRESS_PATH, nrows=0)
+    date_col = next((col for col in ("Traded", "Filed") if col in header.columns), None)
+    date_cols = [date_col] if date_col else []
+    member_col = get_member_id_col(header)
+    
+    # Multithreaded Arrow parser; ISO dates arrive as datetime64 already
+    df_congress = pd.read_csv(
+        RAW_CONGRESS_PATH,
+        engine="pyarrow",
+        usecols=["Ticker", member_col] + date_cols,
+        dtype={"Ticker": "string"},
+        parse_dates=date_cols
+    )
+    
+    # Parse dates (no-op if already parsed; unparseable values -> NaT)
+    if date_col:
+        df_congress[date_col] = pd.to_datetime(df_congress[date_col], errors="coerce")
     
     # Standardize tickers
     df_congress["Ticker"] = standardize_ticker_series(df_congress["Ticker"])
     
     # Get original stats
-    member_col = get_member_id_col(df_congress)
-    
     original_stats = {
         "rows": len(df_congress),
-        "tickers": set(df_congress["Ticker"].dropna().unique()),
+        "n_tickers": df_congress["Ticker"].nunique(),
         "unique_members": df_congress[member_col].nunique(),
         "date_min": df_congress[date_col].min() if date_col else None,
         "date_max": df_congress[date_col].max() if date_col else None,
     }
     
     print(f"  Total trades: {original_stats['rows']:,}")
-    print(f"  Unique tickers: {len(original_stats['tickers']):,}")
+    print(f"  Unique tickers: {original_stats['n_tickers']:,}")
     print(f"  Unique members: {original_stats['unique_members']:,}")
     if date_col:
         print(f"  Date range: {original_stats['date_min']} to {original_stats['date_max']}")
     
     # Filter by available tickers
     print("\nFiltering by available tickers...")
-    df_filtered = df_congress[df_congress["Ticker"].isin(stock_tickers)].copy()
+    # As a category over the available tickers, tickers outside them (and
+    # missing tickers) get code -1
+    available_dtype = pd.CategoricalDtype(categories=stock_tickers)
+    is_available = df_congress["Ticker"].astype(available_dtype).cat.codes.to_numpy() != -1
+    df_filtered = df_congress[is_available]
     
     # Get filtered stats
     filtered_stats = {
         "rows": len(df_filtered),
-        "tickers": set(df_filtered["Ticker"].dropna().unique()),
+        "n_tickers": df_filtered["Ticker"].nunique(),
         "unique_members": df_filtered[member_col].nunique(),
         "date_min": df_filtered[date_col].min() if date_col else None,
         "date_max": df_filtered[date_col].max() if date_col else None,
     }
     
     print(f"  Filtered trades: {filtered_stats['rows']:,}")
-    print(f"  Unique tickers: {len(filtered_stats['tickers']):,}")
+    print(f"  Unique tickers: {filtered_stats['n_tickers']:,}")
     print(f"  Unique members: {filtered_stats['unique_members']:,}")
     if date_col:
         print(f"  Date range: {filtered_stats['date_min']} to {filtered_stats['date_max']}")
@@ -100,35 +191,30 @@ def main():
     # Calculate changes
     rows_removed = original_stats["rows"] - filtered_stats["rows"]
     pct_removed = (rows_removed / original_stats["rows"]) * 100
-    tickers_removed = len(original_stats["tickers"]) - len(filtered_stats["tickers"])
-    pct_tickers_removed = (tickers_removed / len(original_stats["tickers"])) * 100
+    tickers_removed = original_stats["n_tickers"] - filtered_stats["n_tickers"]
+    pct_tickers_removed = (tickers_removed / original_stats["n_tickers"]) * 100
     
     print(f"\nRemoved:")
     print(f"  Trades: {rows_removed:,} ({pct_removed:.2f}%)")
     print(f"  Tickers: {tickers_removed:,} ({pct_tickers_removed:.2f}%)")
     
-    # Save filtered data
-    print(f"\nSaving filtered congressional data to {OUT_CONGRESS_PATH}...")
-    df_filtered.to_csv(OUT_CONGRESS_PATH, index=False)
+    # Save filtered data (all columns of the raw file)
+    write_filtered_congress(header.columns, is_available, df_filtered, date_col)
     
     # Load first-pass filtered data for comparison
     print("\nLoading first-pass filtered data for comparison...")
-    df_first_pass = pd.read_csv(
-        "/Users/caleb/Research/congress_trading/data/derived/congress_trading_filtered.csv",
-        usecols=["Ticker"]
-    )
-    df_first_pass["Ticker"] = standardize_ticker_series(df_first_pass["Ticker"])
-    first_pass_rows = len(df_first_pass)
-    first_pass_tickers = df_first_pass["Ticker"].nunique()
+    first_pass = load_first_pass_tickers()
+    first_pass_rows = len(first_pass)
+    first_pass_tickers = first_pass.nunique()
     
     # Calculate recovery
     rows_recovered = filtered_stats["rows"] - first_pass_rows
-    tickers_recovered = len(filtered_stats["tickers"]) - first_pass_tickers
+    tickers_recovered = filtered_stats["n_tickers"] - first_pass_tickers
     pct_recovery = (rows_recovered / rows_removed) * 100 if rows_removed > 0 else 0
     
     print(f"\nComparison with first-pass filtering:")
     print(f"  First pass: {first_pass_rows:,} trades, {first_pass_tickers:,} tickers")
-    print(f"  Enhanced: {filtered_stats['rows']:,} trades, {len(filtered_stats['tickers']):,} tickers")
+    print(f"  Enhanced: {filtered_stats['rows']:,} trades, {filtered_stats['n_tickers']:,} tickers")
     print(f"  Recovered: {rows_recovered:,} trades ({pct_recovery:.2f}% of removed)")
     print(f"  Tickers recovered: {tickers_recovered:,}")
     
@@ -140,7 +226,7 @@ def main():
     print("\n" + "="*70)
     print("FILTERING COMPLETE")
     print("="*70)
-    print(f"\nOutput file: {OUT_CONGRESS_PATH}")
+    print(f"\nOutput file: {OUT_CONGRESS_PATH} (+ .full.parquet)")
     print(f"Report: {REPORT_PATH}")
 
 
@@ -149,7 +235,7 @@ def write_report(original, filtered, first_pass_rows, first_pass_tickers,
                 rows_recovered, tickers_recovered, member_col, date_col):
     """Generate markdown report of refiltering results."""
     
-    report = f"""# Congressional Trading Re-filtering Report (Enhanced Data)
+    parts = [f"""# Congressional Trading Re-filtering Report (Enhanced Data)
 
 **Generated:** {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 
@@ -166,24 +252,24 @@ This report documents the re-filtering of congressional trading data using the Y
 
 ### Original Congressional Data
 - **Total trades**: {original['rows']:,}
-- **Unique tickers**: {len(original['tickers']):,}
+- **Unique tickers**: {original['n_tickers']:,}
 - **Unique members**: {original['unique_members']:,}
-"""
+"""]
     
     if date_col:
-        report += f"- **Date range**: {original['date_min']} to {original['date_max']}\n"
+        parts.append(f"- **Date range**: {original['date_min']} to {original['date_max']}\n")
     
-    report += f"""
+    parts.append(f"""
 ### Enhanced Filtered Data
 - **Total trades**: {filtered['rows']:,}
-- **Unique tickers**: {len(filtered['tickers']):,}
+- **Unique tickers**: {filtered['n_tickers']:,}
 - **Unique members**: {filtered['unique_members']:,}
-"""
+""")
     
     if date_col:
-        report += f"- **Date range**: {filtered['date_min']} to {filtered['date_max']}\n"
+        parts.append(f"- **Date range**: {filtered['date_min']} to {filtered['date_max']}\n")
     
-    report += f"""
+    parts.append(f"""
 ### Removed (Still Unmatched)
 - **Trades**: {rows_removed:,} ({pct_removed:.2f}%)
 - **Tickers**: {tickers_removed:,} ({pct_tickers_removed:.2f}%)
@@ -197,16 +283,16 @@ The first-pass filtering used only the original stock data (9,315 tickers). With
 | Metric | First Pass | Enhanced | Recovered |
 |--------|-----------|----------|-----------|
 | **Trades** | {first_pass_rows:,} | {filtered['rows']:,} | **{rows_recovered:,}** |
-| **Tickers** | {first_pass_tickers:,} | {len(filtered['tickers']):,} | **{tickers_recovered:,}** |
+| **Tickers** | {first_pass_tickers:,} | {filtered['n_tickers']:,} | **{tickers_recovered:,}** |
 
 ### Trade Recovery Rate
 - **{rows_recovered:,} additional trades** recovered ({(rows_recovered/original['rows']*100):.2f}% of original dataset)
 - This represents **{(rows_recovered/(original['rows']-first_pass_rows)*100):.2f}%** of trades that were removed in first pass
 
 ### Ticker Coverage
-- **Original coverage**: {(first_pass_tickers/len(original['tickers'])*100):.1f}% ({first_pass_tickers:,}/{len(original['tickers']):,})
-- **Enhanced coverage**: {(len(filtered['tickers'])/len(original['tickers'])*100):.1f}% ({len(filtered['tickers']):,}/{len(original['tickers']):,})
-- **Improvement**: +{((len(filtered['tickers'])-first_pass_tickers)/len(original['tickers'])*100):.1f} percentage points
+- **Original coverage**: {(first_pass_tickers/original['n_tickers']*100):.1f}% ({first_pass_tickers:,}/{original['n_tickers']:,})
+- **Enhanced coverage**: {(filtered['n_tickers']/original['n_tickers']*100):.1f}% ({filtered['n_tickers']:,}/{original['n_tickers']:,})
+- **Improvement**: +{((filtered['n_tickers']-first_pass_tickers)/original['n_tickers']*100):.1f} percentage points
 
 ---
 
@@ -214,7 +300,7 @@ The first-pass filtering used only the original stock data (9,315 tickers). With
 
 ### Coverage Statistics
 - **Trade retention rate**: {(filtered['rows']/original['rows']*100):.2f}%
-- **Ticker retention rate**: {(len(filtered['tickers'])/len(original['tickers'])*100):.2f}%
+- **Ticker retention rate**: {(filtered['n_tickers']/original['n_tickers']*100):.2f}%
 - **Member retention rate**: {(filtered['unique_members']/original['unique_members']*100):.2f}%
 
 ### Unmatched Trades
@@ -261,11 +347,11 @@ This enhanced dataset is now ready for difference-in-differences analysis:
 3. **Pre-spike Window Analysis**: Test for anticipatory trading (t-3, t-5, t-7 days)
 4. **Heterogeneity Analysis**: By party, committee, seniority, trade type
 
-**Final Sample Size**: {filtered['rows']:,} congressional trades across {len(filtered['tickers']):,} tickers (2012-2024)
-"""
+**Final Sample Size**: {filtered['rows']:,} congressional trades across {filtered['n_tickers']:,} tickers (2012-2024)
+""")
 
     with open(REPORT_PATH, "w") as f:
-        f.write(report)
+        f.write("".join(parts))
     
     print(f"\nReport saved to: {REPORT_PATH}")
 